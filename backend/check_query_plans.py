@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Query plan regression check for the API's MongoDB queries.
+
+Runs tests/test_query_plans.py with pytest: it seeds a scratch database
+on a local mongod, calls the endpoint functions and explains every query
+they send, failing on a COLLSCAN, a scanning $lookup or a stage that
+examines more than --max-ratio times the documents it returns. The
+options are passed to the tests as QUERY_PLANS_* environment variables.
+
+Runs offline against a local mongod only. The scratch database is dropped
+and reseeded on every run, so its name has to end in "_query_plans".
+
+Usage:
+    python check_query_plans.py [--mongo-url URL] [--db NAME] [--max-ratio N] [--ideas N] [--users N]
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+TEST_MODULE = Path(__file__).resolve().parent.parent / "tests" / "test_query_plans.py"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Explain the API's MongoDB queries against a seeded local mongod")
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="ideahero_query_plans")
+    parser.add_argument("--max-ratio", type=float, default=10.0, help="max documents examined per document returned")
+    parser.add_argument("--ideas", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database afterwards")
+    parser.add_argument("--verbose", action="store_true", help="list the scenarios that passed too")
+    args = parser.parse_args()
+    if not args.db.endswith("_query_plans"):
+        parser.error("--db must end in _query_plans, the database is dropped on every run")
+
+    os.environ.update({
+        "QUERY_PLANS_MONGO_URL": args.mongo_url,
+        "QUERY_PLANS_DB": args.db,
+        "QUERY_PLANS_MAX_RATIO": str(args.max_ratio),
+        "QUERY_PLANS_IDEAS": str(args.ideas),
+        "QUERY_PLANS_USERS": str(args.users),
+        "QUERY_PLANS_KEEP": "true" if args.keep else "false",
+    })
+    return pytest.main([str(TEST_MODULE), "-rs", "-v" if args.verbose else "-q"])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Ensure or audit the MongoDB indexes declared in server.INDEXES.
+
+    ensure  create every declared index that does not exist yet
+    audit   compare the live indexes with the registry and report
+            - missing indexes: declared but not present
+            - undeclared indexes: present but not in the registry
+            - unused indexes: no operations since $indexStats started counting
+            - redundant indexes: a plain index whose keys are a prefix of
+              another index on the same collection
+
+$indexStats counters are per mongod and reset on restart, so check the
+"since" date before dropping an index reported as unused.
+
+Usage:
+    python manage_indexes.py ensure
+    python manage_indexes.py audit [--collection NAME]
+
+Both commands exit with status 1 when a declared index is missing or could
+not be created.
+"""
+import argparse
+import asyncio
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from server import db, INDEXES, ensure_indexes
+
+# Options that make an index more than a lookup structure
+SPECIAL_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+Keys = Tuple[Tuple[str, int], ...]
+
+
+def normalize_keys(keys) -> Keys:
+    return tuple((field, int(direction) if isinstance(direction, (int, float)) else direction) for field, direction in keys)
+
+
+def is_prefix(keys: Keys, other: Keys) -> bool:
+    return len(keys) < len(other) and other[:len(keys)] == keys
+
+
+async def index_stats(collection_name: str) -> Dict[str, dict]:
+    return {
+        row["name"]: row["accesses"]
+        async for row in db[collection_name].aggregate([{"$indexStats": {}}])
+    }
+
+
+async def audit_collection(collection_name: str) -> List[str]:
+    """Print the audit of one collection, returns the missing indexes"""
+    declared = [normalize_keys(keys) for keys, _ in INDEXES.get(collection_name, [])]
+    info = await db[collection_name].index_information()
+    live = {name: normalize_keys(spec["key"]) for name, spec in info.items() if name != "_id_"}
+    accesses = await index_stats(collection_name)
+
+    missing = [keys for keys in declared if keys not in live.values()]
+    undeclared = [name for name, keys in live.items() if keys not in declared]
+    unused = [name for name in live if accesses.get(name, {}).get("ops", 0) == 0]
+    redundant = [
+        (name, other)
+        for name, keys in live.items()
+        if not any(option in info[name] for option in SPECIAL_OPTIONS)
+        for other, other_keys in live.items()
+        if is_prefix(keys, other_keys)
+    ]
+
+    print(f"{collection_name}: {len(live)} indexes, {len(declared)} declared")
+    for keys in missing:
+        print(f"  ❌ missing     {list(keys)}")
+    for name in undeclared:
+        print(f"  ⚠️  undeclared  {name}")
+    for name in unused:
+        since = accesses.get(name, {}).get("since")
+        print(f"  ⚠️  unused      {name} (no operations since {since})")
+    for name, other in redundant:
+        print(f"  ⚠️  redundant   {name} (prefix of {other})")
+    return [f"{collection_name} {list(keys)}" for keys in missing]
+
+
+async def audit(collection_filter: Optional[str] = None) -> int:
+    existing = set(await db.list_collection_names())
+    collections = sorted((set(INDEXES) | existing) - {"system.views"})
+    if collection_filter:
+        collections = [collection_filter]
+
+    missing = []
+    for collection_name in collections:
+        if collection_name not in existing:
+            declared = INDEXES.get(collection_name, [])
+            print(f"{collection_name}: collection does not exist yet, {len(declared)} declared indexes")
+            missing += [f"{collection_name} {keys}" for keys, _ in declared]
+            continue
+        missing += await audit_collection(collection_name)
+
+    if missing:
+        print(f"{len(missing)} declared indexes are missing, run: python manage_indexes.py ensure")
+        return 1
+    print("✅ All declared indexes exist")
+    return 0
+
+
+async def ensure() -> int:
+    total = sum(len(indexes) for indexes in INDEXES.values())
+    print(f"Ensuring {total} indexes on {len(INDEXES)} collections...")
+    failed = await ensure_indexes()
+    for index in failed:
+        print(f"  ❌ {index}")
+    if failed:
+        print(f"{len(failed)} indexes could not be created, see the log above")
+        return 1
+    print("✅ Indexes ensured")
+    return 0
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="Ensure or audit the declared MongoDB indexes")
+    parser.add_argument("command", choices=["ensure", "audit"])
+    parser.add_argument("--collection", help="audit a single collection")
+    args = parser.parse_args()
+
+    if args.command == "ensure":
+        return await ensure()
+    return await audit(args.collection)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -15,6 +15,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from dotenv import load_dotenv
 from pathlib import Path
 
+from server import NEW_IDEA_RANKING
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
@@ -214,7 +216,7 @@ async def migrate_ideas():
     for idea in sample_ideas:
         existing = await db.ideas.find_one({"title": idea["title"]})
         if not existing:
-            await db.ideas.insert_one(idea)
+            await db.ideas.insert_one({**idea, **NEW_IDEA_RANKING})
             print(f"Added idea: {idea['title']}")
         else:
             print(f"Idea already exists: {idea['title']}")
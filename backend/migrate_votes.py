@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Convert idea_votes documents to the compact vote format.
+
+Older votes store the user id as a string, the vote type and the three
+scores as separate fields and created_at as a datetime. This rewrites them
+with server.encode_vote in unordered bulk replaces. A replace only matches
+a document still in the old format, so the migration can be interrupted
+and re-run.
+
+The API looks votes up by binary user id and does not read the old
+format, so run this before starting the API on the compact format. If a
+user voted again through the new API before their old vote was migrated,
+the newer vote is kept and the old one deleted; run
+rescore_ideas.py --recount afterwards to correct the counters of those
+ideas.
+
+Usage:
+    python migrate_votes.py [--batch-size N] [--dry-run]
+"""
+import argparse
+import asyncio
+import time
+from typing import List, Tuple
+
+from pymongo import DeleteOne, ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from server import db, IdeaVote, encode_vote
+
+LEGACY_VOTE_FILTER = {"vote_type": {"$exists": True}}
+DUPLICATE_KEY_ERROR = 11000
+
+
+async def migrate_batch(votes: List[dict]) -> Tuple[int, int]:
+    """Replace a batch of old format votes, returns (migrated, superseded)"""
+    operations = [
+        ReplaceOne(
+            {"_id": vote["_id"], **LEGACY_VOTE_FILTER},
+            encode_vote(IdeaVote(**vote).dict(), vote["idea_id"], vote["idea_collection"])
+        )
+        for vote in votes
+    ]
+    try:
+        result = await db.idea_votes.bulk_write(operations, ordered=False)
+        return result.modified_count, 0
+    except BulkWriteError as error:
+        details = error.details
+        duplicates = [e["index"] for e in details["writeErrors"] if e["code"] == DUPLICATE_KEY_ERROR]
+        if len(duplicates) != len(details["writeErrors"]):
+            raise
+        # A compact vote from the same user already exists, it is the newer one
+        await db.idea_votes.bulk_write(
+            [DeleteOne({"_id": votes[index]["_id"], **LEGACY_VOTE_FILTER}) for index in duplicates],
+            ordered=False
+        )
+        return details["nModified"], len(duplicates)
+
+
+async def migrate(batch_size: int, dry_run: bool):
+    remaining = await db.idea_votes.count_documents(LEGACY_VOTE_FILTER)
+    print(f"{remaining} votes in the old format")
+    if dry_run or not remaining:
+        return
+
+    started = time.perf_counter()
+    processed = migrated = superseded = 0
+    batch = []
+    cursor = db.idea_votes.find(LEGACY_VOTE_FILTER).batch_size(batch_size)
+    async for vote in cursor:
+        batch.append(vote)
+        if len(batch) >= batch_size:
+            counts = await migrate_batch(batch)
+            migrated, superseded = migrated + counts[0], superseded + counts[1]
+            processed += len(batch)
+            batch = []
+            elapsed = time.perf_counter() - started
+            print(f"  {processed}/{remaining} votes, {processed / elapsed:.0f} votes/sec")
+    if batch:
+        counts = await migrate_batch(batch)
+        migrated, superseded = migrated + counts[0], superseded + counts[1]
+        processed += len(batch)
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Migrated {migrated} votes in {elapsed:.1f}s")
+    if superseded:
+        print(f"⚠️  Deleted {superseded} old votes superseded by newer ones, run: python rescore_ideas.py --recount")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Convert stored votes to the compact format")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="only count the votes left to migrate")
+    args = parser.parse_args()
+    await migrate(args.batch_size, args.dry_run)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
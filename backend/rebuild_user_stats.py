@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Rebuild the user_stats documents behind the dashboard.
+
+Recomputes each user's counters, category counts, activity span and recent
+activity from idea_votes, idea_comments and submitted_ideas. Documents are
+otherwise kept up to date incrementally by the API and rebuilt on their
+first read, so this is only needed after a bug or a manual data fix.
+
+Activity recorded by a running API between the read and the write of a
+user's document can be counted twice; run it while the API is stopped for
+exact results.
+
+Usage:
+    python rebuild_user_stats.py [--user USER_ID] [--concurrency N]
+"""
+import argparse
+import asyncio
+import time
+
+from server import db, rebuild_user_stats
+
+
+async def rebuild_all(concurrency: int) -> int:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def rebuild(user_id: str):
+        async with semaphore:
+            await rebuild_user_stats(user_id)
+
+    started = time.perf_counter()
+    user_ids = [user["id"] async for user in db.users.find({}, {"_id": 0, "id": 1})]
+    for start in range(0, len(user_ids), 1000):
+        await asyncio.gather(*(rebuild(user_id) for user_id in user_ids[start:start + 1000]))
+        done = min(start + 1000, len(user_ids))
+        elapsed = time.perf_counter() - started
+        print(f"  {done}/{len(user_ids)} users, {done / elapsed:.0f} users/sec")
+    return len(user_ids)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Rebuild user_stats from the source collections")
+    parser.add_argument("--user", help="rebuild a single user")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    print("Rebuilding user stats...")
+    started = time.perf_counter()
+    if args.user:
+        await rebuild_user_stats(args.user)
+        total = 1
+    else:
+        total = await rebuild_all(args.concurrency)
+    print(f"✅ Rebuilt stats for {total} users in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Replay the reputation ledger with the current point rules.
+
+Re-prices every event in reputation_events with REPUTATION_POINTS from
+server.py and recomputes users.reputation_score as
+
+    reputation_baseline + sum(points of applied events)
+
+reputation_baseline is the reputation a user had earned before the ledger
+existed. It is derived once, on the first replay, from the score and the
+events applied so far. Stop the API (or at least the ledger folding) while
+replaying so no batch is folded halfway through.
+"""
+import asyncio
+from typing import Dict
+
+from pymongo import UpdateOne
+
+from server import db, REPUTATION_POINTS
+
+
+async def applied_points_by_user() -> Dict[str, int]:
+    pipeline = [
+        {"$match": {"applied": True}},
+        {"$group": {"_id": "$user_id", "points": {"$sum": "$points"}}},
+    ]
+    return {row["_id"]: row["points"] async for row in db.reputation_events.aggregate(pipeline)}
+
+
+async def ensure_baselines():
+    """Record what each user earned before the ledger, using the points as stored"""
+    applied = await applied_points_by_user()
+    operations = []
+    cursor = db.users.find({"reputation_baseline": {"$exists": False}}, {"_id": 0, "id": 1, "reputation_score": 1})
+    async for user in cursor:
+        baseline = user.get("reputation_score", 0) - applied.get(user["id"], 0)
+        operations.append(UpdateOne(
+            {"id": user["id"], "reputation_baseline": {"$exists": False}},
+            {"$set": {"reputation_baseline": baseline}}
+        ))
+    if operations:
+        await db.users.bulk_write(operations, ordered=False)
+    print(f"Recorded baselines for {len(operations)} users")
+
+
+async def reprice_events():
+    for reason, points in REPUTATION_POINTS.items():
+        result = await db.reputation_events.update_many(
+            {"reason": reason, "points": {"$ne": points}},
+            {"$set": {"points": points}}
+        )
+        print(f"  {reason}: {points} points, {result.modified_count} events repriced")
+
+
+async def replay_reputation():
+    print("Replaying reputation ledger...")
+    await ensure_baselines()
+    await reprice_events()
+
+    applied = await applied_points_by_user()
+    operations = []
+    cursor = db.users.find({}, {"_id": 0, "id": 1, "reputation_baseline": 1, "reputation_score": 1})
+    async for user in cursor:
+        score = user.get("reputation_baseline", 0) + applied.get(user["id"], 0)
+        if score != user.get("reputation_score"):
+            operations.append(UpdateOne({"id": user["id"]}, {"$set": {"reputation_score": score}}))
+        if len(operations) >= 1000:
+            await db.users.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        await db.users.bulk_write(operations, ordered=False)
+    print("✅ Reputation replay complete")
+
+
+if __name__ == "__main__":
+    asyncio.run(replay_reputation())
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Batch rescoring job for ideas and submitted ideas.
+
+Recomputes the stored validation_score and avg_* fields with the current
+weights in server.py. Ideas are streamed in batches and scored with NumPy
+over columnar arrays, then written back with unordered bulk updates.
+
+By default the scores are derived from the running vote counters on each
+idea. With --recount the counters themselves are rebuilt from idea_votes
+first; run that while voting is paused, since a vote landing between the
+read and the write of its idea would be overwritten.
+
+Usage:
+    python rescore_ideas.py [--collection ideas|submitted_ideas|all] [--batch-size N] [--recount]
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+import numpy as np
+from pymongo import UpdateOne
+
+from server import (
+    db,
+    VOTE_COUNTER_FIELDS,
+    VOTE_RATIO_WEIGHT,
+    SCORE_AVERAGE_WEIGHT,
+    VOTE_SCORE_BITS,
+    VOTE_UPVOTE_BIT,
+)
+
+COLLECTIONS = ["ideas", "submitted_ideas"]
+
+
+def score_arrays(counters: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Vectorized scores_from_counters over one array per counter field"""
+    total_votes = counters["total_votes"].astype(np.float64)
+    has_votes = total_votes > 0
+    divisor = np.where(has_votes, total_votes, 1.0)
+
+    avg_feasibility = counters["feasibility_total"] / divisor
+    avg_market_potential = counters["market_potential_total"] / divisor
+    avg_interest = counters["interest_total"] / divisor
+
+    vote_ratio = counters["upvotes"] / divisor
+    score_average = (avg_feasibility + avg_market_potential + avg_interest) / 3
+    validation_score = (vote_ratio * VOTE_RATIO_WEIGHT + score_average / 5 * SCORE_AVERAGE_WEIGHT) * 100
+
+    return {
+        "validation_score": np.where(has_votes, np.round(validation_score, 1), 0.0),
+        "avg_feasibility": np.where(has_votes, np.round(avg_feasibility, 1), 0.0),
+        "avg_market_potential": np.where(has_votes, np.round(avg_market_potential, 1), 0.0),
+        "avg_interest": np.where(has_votes, np.round(avg_interest, 1), 0.0),
+    }
+
+
+def counters_from_ideas(ideas: List[dict]) -> Dict[str, np.ndarray]:
+    return {
+        field: np.fromiter((idea.get(field, 0) for idea in ideas), dtype=np.int64, count=len(ideas))
+        for field in VOTE_COUNTER_FIELDS
+    }
+
+
+async def counters_from_votes(idea_ids: List[str]) -> Dict[str, np.ndarray]:
+    """Sum the votes of a batch of ideas with np.bincount over columnar arrays.
+
+    The packed votes are unpacked with vectorized shifts and masks.
+    """
+    positions = {idea_id: i for i, idea_id in enumerate(idea_ids)}
+    idea_index, packed = [], []
+
+    cursor = db.idea_votes.find({"idea_id": {"$in": idea_ids}}, {"_id": 0, "idea_id": 1, "vote": 1})
+    async for vote in cursor:
+        idea_index.append(positions[vote["idea_id"]])
+        packed.append(vote["vote"])
+
+    n = len(idea_ids)
+    idea_index = np.asarray(idea_index, dtype=np.int64)
+    packed = np.asarray(packed, dtype=np.int64)
+    upvotes = (packed >> VOTE_UPVOTE_BIT) & 1
+
+    def column_sum(weights) -> np.ndarray:
+        return np.bincount(idea_index, weights=np.asarray(weights, dtype=np.float64), minlength=n).astype(np.int64)
+
+    def score_sum(position: int) -> np.ndarray:
+        return column_sum((packed >> (position * VOTE_SCORE_BITS)) & ((1 << VOTE_SCORE_BITS) - 1))
+
+    return {
+        "total_votes": np.bincount(idea_index, minlength=n).astype(np.int64),
+        "upvotes": column_sum(upvotes),
+        "downvotes": column_sum(1 - upvotes),
+        "feasibility_total": score_sum(0),
+        "market_potential_total": score_sum(1),
+        "interest_total": score_sum(2),
+    }
+
+
+async def rescore_batch(collection_name: str, ideas: List[dict], recount: bool) -> int:
+    idea_ids = [idea["id"] for idea in ideas]
+    if recount:
+        counters = await counters_from_votes(idea_ids)
+    else:
+        counters = counters_from_ideas(ideas)
+    scores = score_arrays(counters)
+
+    operations = []
+    for i, idea in enumerate(ideas):
+        update = {field: float(values[i]) for field, values in scores.items()}
+        idea_filter = {"id": idea["id"]}
+        if recount:
+            update.update({field: int(counters[field][i]) for field in VOTE_COUNTER_FIELDS})
+        else:
+            # Skip ideas whose counters moved since they were read, the vote
+            # that moved them already stored fresh scores
+            idea_filter.update({field: idea[field] for field in VOTE_COUNTER_FIELDS if field in idea})
+        operations.append(UpdateOne(idea_filter, {"$set": update}))
+
+    if operations:
+        result = await db[collection_name].bulk_write(operations, ordered=False)
+        return result.modified_count
+    return 0
+
+
+async def rescore_collection(collection_name: str, batch_size: int, recount: bool):
+    projection = {"_id": 0, "id": 1}
+    if not recount:
+        projection.update({field: 1 for field in VOTE_COUNTER_FIELDS})
+
+    started = time.perf_counter()
+    processed = 0
+    modified = 0
+    batch = []
+    cursor = db[collection_name].find({}, projection).batch_size(batch_size)
+    async for idea in cursor:
+        batch.append(idea)
+        if len(batch) >= batch_size:
+            modified += await rescore_batch(collection_name, batch, recount)
+            processed += len(batch)
+            batch = []
+            elapsed = time.perf_counter() - started
+            print(f"  {collection_name}: {processed} ideas, {processed / elapsed:.0f} ideas/sec")
+    if batch:
+        modified += await rescore_batch(collection_name, batch, recount)
+        processed += len(batch)
+
+    elapsed = time.perf_counter() - started
+    rate = processed / elapsed if elapsed > 0 else 0
+    print(f"✅ {collection_name}: rescored {processed} ideas ({modified} changed) in {elapsed:.1f}s, {rate:.0f} ideas/sec")
+    return processed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Recompute stored idea scores")
+    parser.add_argument("--collection", choices=COLLECTIONS + ["all"], default="all")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--recount", action="store_true", help="rebuild vote counters from idea_votes first")
+    args = parser.parse_args()
+
+    collections = COLLECTIONS if args.collection == "all" else [args.collection]
+    print(f"Rescoring {', '.join(collections)} (weights {VOTE_RATIO_WEIGHT}/{SCORE_AVERAGE_WEIGHT})...")
+
+    started = time.perf_counter()
+    total = 0
+    for collection_name in collections:
+        total += await rescore_collection(collection_name, args.batch_size, args.recount)
+    elapsed = time.perf_counter() - started
+    print(f"Done: {total} ideas in {elapsed:.1f}s, {total / elapsed if elapsed > 0 else 0:.0f} ideas/sec")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,27 +1,150 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Query, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import ORJSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers, MutableHeaders
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne, ReplaceOne, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal, Tuple, Union
+import base64
+from bson import json_util, Int64, Binary
 import uuid
 from datetime import datetime, timedelta
 import hashlib
 import jwt
 from passlib.context import CryptContext
 import re
+import asyncio
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import brotli
+except ImportError:  # optional, responses are gzipped without it
+    brotli = None
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# MongoDB connection pool
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '10'))  # opened at startup
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '5000'))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '10000'))
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Connection pool telemetry from PyMongo's CMAP events.
+    
+    PyMongo 4.5 events carry no durations. A checkout starts and completes
+    on the same Motor worker thread, so the start time is kept in a
+    thread-local and the wait is measured when the checkout completes.
+    """
+    
+    WAIT_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.connections = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.checkouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.wait_histogram = [0] * (len(self.WAIT_BUCKETS_MS) + 1)
+        self.checkout_failures: Dict[str, int] = {}
+        self.pool_clears = 0
+    
+    def _wait_ms(self) -> float:
+        started = getattr(self._local, "checkout_started", None)
+        self._local.checkout_started = None
+        return (time.perf_counter() - started) * 1000 if started is not None else 0.0
+    
+    def connection_check_out_started(self, event):
+        self._local.checkout_started = time.perf_counter()
+    
+    def connection_checked_out(self, event):
+        wait_ms = self._wait_ms()
+        bucket = next((i for i, bound in enumerate(self.WAIT_BUCKETS_MS) if wait_ms <= bound), len(self.WAIT_BUCKETS_MS))
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            self.wait_histogram[bucket] += 1
+    
+    def connection_check_out_failed(self, event):
+        self._wait_ms()
+        with self._lock:
+            self.checkout_failures[event.reason] = self.checkout_failures.get(event.reason, 0) + 1
+    
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+    
+    def connection_created(self, event):
+        with self._lock:
+            self.connections += 1
+    
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections -= 1
+    
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+    
+    def connection_ready(self, event):
+        pass
+    
+    def pool_created(self, event):
+        pass
+    
+    def pool_ready(self, event):
+        pass
+    
+    def pool_closed(self, event):
+        pass
+    
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            labels = [f"<={bound}ms" for bound in self.WAIT_BUCKETS_MS] + [f">{self.WAIT_BUCKETS_MS[-1]}ms"]
+            return {
+                "max_pool_size": MONGO_MAX_POOL_SIZE,
+                "connections": self.connections,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "checkouts": self.checkouts,
+                "avg_wait_ms": round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait_ms, 3),
+                "wait_histogram": dict(zip(labels, self.wait_histogram)),
+                "checkout_failures": dict(self.checkout_failures),
+                "pool_clears": self.pool_clears,
+            }
+
+pool_monitor = PoolMonitor()
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    event_listeners=[pool_monitor]
+)
 db = client[os.environ['DB_NAME']]
 
 # Security configuration
@@ -29,8 +152,73 @@ SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production'
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 days
 
+# Write-behind vote buffer for POST /api/ideas/{idea_id}/vote
+VOTE_BUFFER_ENABLED = os.environ.get('VOTE_BUFFER_ENABLED', 'false').lower() == 'true'
+VOTE_BUFFER_MAX_SIZE = int(os.environ.get('VOTE_BUFFER_MAX_SIZE', '1000'))
+VOTE_BUFFER_FLUSH_INTERVAL = float(os.environ.get('VOTE_BUFFER_FLUSH_INTERVAL', '1.0'))  # seconds
+
+# Precomputed "hot" and "wilson" ranking keys
+RANKING_REFRESH_INTERVAL = float(os.environ.get('RANKING_REFRESH_INTERVAL', '300'))  # seconds
+HOT_GRAVITY = float(os.environ.get('HOT_GRAVITY', '1.8'))
+HOT_REFRESH_MAX_AGE = float(os.environ.get('HOT_REFRESH_MAX_AGE', '14'))  # days
+WILSON_Z = 1.96  # 95% confidence
+
+# Reputation ledger
+REPUTATION_FLUSH_INTERVAL = float(os.environ.get('REPUTATION_FLUSH_INTERVAL', '1.0'))  # seconds
+REPUTATION_FOLD_BATCH_SIZE = int(os.environ.get('REPUTATION_FOLD_BATCH_SIZE', '1000'))
+REPUTATION_CLAIM_TIMEOUT = float(os.environ.get('REPUTATION_CLAIM_TIMEOUT', '60'))  # seconds
+REPUTATION_BATCH_HISTORY = 32  # folded batch ids remembered per user
+
+# Per-user dashboard stats
+USER_STATS_FLUSH_INTERVAL = float(os.environ.get('USER_STATS_FLUSH_INTERVAL', '1.0'))  # seconds
+USER_STATS_FLUSH_HISTORY = 32  # applied flush ids remembered per stats document
+
+# Feed and comment pagination
+FEED_PAGE_SIZE = 20
+MAX_FEED_PAGE_SIZE = 100
+COMMENT_PAGE_SIZE = 20
+MAX_COMMENT_PAGE_SIZE = 100
+
+# Create missing indexes at startup, disable to manage them with manage_indexes.py only
+ENSURE_INDEXES_ON_STARTUP = os.environ.get('ENSURE_INDEXES_ON_STARTUP', 'true').lower() == 'true'
+
+# Per-query timeout of the concurrent dashboard and analytics reads
+QUERY_TIMEOUT = float(os.environ.get('QUERY_TIMEOUT', '2.0'))  # seconds
+
+# Feed and idea responses skip model validation and are encoded with orjson.
+# Keep it off in tests so responses are checked against the models.
+FAST_RESPONSES_ENABLED = os.environ.get('FAST_RESPONSES_ENABLED', 'false').lower() == 'true'
+
+# Rendered /api/ideas pages are cached in process. Entries are fresh for
+# FEED_CACHE_TTL, then served for up to FEED_CACHE_STALE_TTL more while a
+# single request refreshes them.
+FEED_CACHE_ENABLED = os.environ.get('FEED_CACHE_ENABLED', 'true').lower() == 'true'
+FEED_CACHE_SIZE = int(os.environ.get('FEED_CACHE_SIZE', '500'))  # pages
+FEED_CACHE_TTL = float(os.environ.get('FEED_CACHE_TTL', '5'))  # seconds
+FEED_CACHE_STALE_TTL = float(os.environ.get('FEED_CACHE_STALE_TTL', '30'))  # seconds
+
+# Response compression, br needs the brotli package and falls back to gzip without it
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))  # bytes
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))  # 1-9
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '5'))  # 0-11
+
+# Resolved users cached by get_current_user
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', '10000'))
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', '60'))  # seconds
+
+# Claims tokens carry a profile snapshot so get_token_user can skip the users read
+CLAIMS_TOKENS_ENABLED = os.environ.get('CLAIMS_TOKENS_ENABLED', 'false').lower() == 'true'
+PROFILE_CLAIMS_VERSION = 1  # bump when the snapshot layout changes
+TOKEN_VERSION_TTL = float(os.environ.get('TOKEN_VERSION_TTL', '300'))  # seconds
+
+# Password hashing runs in a bounded worker pool, requests beyond the queue
+# limit get a 503 instead of piling up behind bcrypt
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '4'))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', '32'))
+
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 security = HTTPBearer()
 
 # Create the main app without a prefix
@@ -72,6 +260,16 @@ class User(BaseModel):
     reputation_score: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
     is_active: bool = True
+    token_version: int = 0  # bumped to revoke issued tokens
+    profile_version: int = 0  # bumped when the token profile snapshot changes
+
+class TokenUser(BaseModel):
+    """Profile snapshot carried by claims tokens"""
+    id: str
+    full_name: str
+    experience_level: str = "beginner"
+    created_at: datetime
+    token_version: int = 0
 
 class UserResponse(BaseModel):
     id: str
@@ -116,6 +314,8 @@ class EnhancedIdea(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     votes: List[IdeaVote] = []
     comments: List[IdeaComment] = []
+    comment_count: int = 0
+    next_comment_cursor: Optional[str] = None
     implementation_guide: Optional[Dict[str, Any]] = None
     validation_score: float = 0.0
     total_votes: int = 0
@@ -123,12 +323,19 @@ class EnhancedIdea(BaseModel):
     avg_market_potential: float = 0.0
     avg_interest: float = 0.0
 
+class CommentPage(BaseModel):
+    comments: List[IdeaComment]
+    next_cursor: Optional[str] = None
+
+VoteType = Literal["upvote", "downvote"]
+MIN_VOTE_SCORE, MAX_VOTE_SCORE = 1, 5
+
 class VoteCreate(BaseModel):
     idea_id: str
-    vote_type: str
-    feasibility_score: int
-    market_potential_score: int
-    interest_score: int
+    vote_type: VoteType
+    feasibility_score: int = Field(ge=MIN_VOTE_SCORE, le=MAX_VOTE_SCORE)
+    market_potential_score: int = Field(ge=MIN_VOTE_SCORE, le=MAX_VOTE_SCORE)
+    interest_score: int = Field(ge=MIN_VOTE_SCORE, le=MAX_VOTE_SCORE)
 
 class CommentCreate(BaseModel):
     idea_id: str
@@ -171,11 +378,282 @@ class SubmittedIdea(BaseModel):
     admin_notes: Optional[str] = None
     votes: List[IdeaVote] = []
     comments: List[IdeaComment] = []
+    comment_count: int = 0
+    next_comment_cursor: Optional[str] = None
+    validation_score: float = 0.0
+    total_votes: int = 0
+    avg_feasibility: float = 0.0
+    avg_market_potential: float = 0.0
+    avg_interest: float = 0.0
+
+# Feed card models, list endpoints return these unless ?view=full is passed
+class IdeaSummary(BaseModel):
+    id: str
+    title: str
+    description: str
+    tags: List[Dict[str, Any]] = []
+    category: str
+    source: str = "HackerNews"
+    source_url: Optional[str] = None
+    created_at: datetime
+    validation_score: float = 0.0
+    total_votes: int = 0
+    avg_feasibility: float = 0.0
+    avg_market_potential: float = 0.0
+    avg_interest: float = 0.0
+    comment_count: int = 0
+    has_implementation_guide: bool = False  # the guide itself comes with the idea details
+
+class SubmittedIdeaSummary(BaseModel):
+    id: str
+    title: str
+    description: str
+    category: str
+    tags: List[str] = []
+    target_market: Optional[str] = None
+    submitter_id: str
+    submitter_name: str
+    status: str
+    created_at: datetime
     validation_score: float = 0.0
     total_votes: int = 0
     avg_feasibility: float = 0.0
     avg_market_potential: float = 0.0
     avg_interest: float = 0.0
+    comment_count: int = 0
+
+def summary_projection(model, exclude=()) -> Dict[str, int]:
+    """Mongo projection fetching only the fields of a summary model"""
+    projection = {field: 1 for field in model.model_fields if field not in exclude}
+    projection["_id"] = 0
+    return projection
+
+IDEA_SUMMARY_PROJECTION = {
+    **summary_projection(IdeaSummary),
+    "has_implementation_guide": {"$ne": [{"$ifNull": ["$implementation_guide", None]}, None]},
+}
+SUBMITTED_IDEA_SUMMARY_PROJECTION = summary_projection(SubmittedIdeaSummary)
+# Full list views skip the votes and comments arrays, which are drained into
+# idea_votes and idea_comments. Idea details attach the first comment page.
+DRAINED_FIELDS = ("votes", "comments", "next_comment_cursor")
+IDEA_PROJECTION = summary_projection(EnhancedIdea, exclude=DRAINED_FIELDS)
+SUBMITTED_IDEA_PROJECTION = summary_projection(SubmittedIdea, exclude=DRAINED_FIELDS)
+
+# Fast responses: documents written through the models are trusted, so they
+# are cut down to the model's fields and encoded directly instead of being
+# validated into models and serialized again by FastAPI.
+model_layouts: Dict[Any, Tuple[frozenset, Dict[str, Any]]] = {}
+
+def model_layout(model) -> Tuple[frozenset, Dict[str, Any]]:
+    """Field names of a model and the static defaults of its optional fields"""
+    if model not in model_layouts:
+        fields = model.model_fields
+        defaults = {
+            name: field.default
+            for name, field in fields.items()
+            if not field.is_required() and field.default_factory is None
+        }
+        model_layouts[model] = (frozenset(fields), defaults)
+    return model_layouts[model]
+
+def project_document(doc: Dict[str, Any], model) -> Dict[str, Any]:
+    """A trusted document shaped like the model would serialize it"""
+    fields, defaults = model_layout(model)
+    return {**defaults, **{key: value for key, value in doc.items() if key in fields}}
+
+def model_response(docs, model, response: Optional[Response] = None):
+    """Validated models, or an orjson response of the projected documents in fast mode.
+    
+    Headers already set on the injected response are copied, FastAPI drops
+    them when a Response is returned directly.
+    """
+    many = isinstance(docs, list)
+    if not FAST_RESPONSES_ENABLED:
+        return [model(**doc) for doc in docs] if many else model(**docs)
+    
+    content = [project_document(doc, model) for doc in docs] if many else project_document(docs, model)
+    headers = {}
+    if response is not None:
+        headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return ORJSONResponse(content, headers=headers)
+
+def feed_body(docs: List[Dict[str, Any]], model) -> bytes:
+    """The rendered JSON body of a list of documents, for caching"""
+    response = model_response(docs, model)
+    if isinstance(response, Response):
+        return response.body
+    return ORJSONResponse([item.dict() for item in response]).body
+
+class TTLCache:
+    """Bounded in-process LRU cache whose entries expire after ttl seconds"""
+    
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+    
+    def get(self, key: Any) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return entry[1]
+    
+    def set(self, key: Any, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+    
+    def invalidate(self, key: Any):
+        if self._entries.pop(key, None) is not None:
+            self.stats["invalidations"] += 1
+    
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            "size": len(self._entries),
+            "hit_ratio": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+            **self.stats,
+        }
+
+user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+# Feed cache key of the unfiltered feed
+ALL_CATEGORIES = "All"
+
+class FeedCache:
+    """Size-bounded LRU cache of rendered feed pages with stale-while-revalidate.
+    
+    A fresh entry is served as is. An expired entry is served stale while
+    one background load replaces it, and concurrent misses on a key share a
+    single load. Invalidating a category expires its pages and those of the
+    unfiltered feed, so they are revalidated the same way. A load that was
+    running during an invalidation is stored already expired.
+    """
+    
+    def __init__(self, max_size: int, ttl: float, stale_ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self._keys_by_category: Dict[str, set] = {}
+        # A load is stored fresh only if its generation did not change meanwhile
+        self._epoch = 0
+        self._generations: Dict[str, int] = {}
+        self._loading: Dict[Tuple, asyncio.Task] = {}
+        self.stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "invalidations": 0,
+            "evictions": 0,
+        }
+    
+    async def get(self, key: Tuple, category: str, load) -> Dict[str, Any]:
+        """The cached page of a key, loading it with load() if needed"""
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and now < entry["stale_until"]:
+            self._entries.move_to_end(key)
+            if now < entry["fresh_until"]:
+                self.stats["hits"] += 1
+            else:
+                self.stats["stale_hits"] += 1
+                if key not in self._loading:
+                    self.stats["refreshes"] += 1
+                    self._start_load(key, category, load).add_done_callback(self._refresh_done)
+            return entry
+        
+        task = self._loading.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["misses"] += 1
+            task = self._start_load(key, category, load)
+        # Shielded so a disconnecting client does not cancel the load others wait for
+        return await asyncio.shield(task)
+    
+    def _start_load(self, key: Tuple, category: str, load) -> asyncio.Task:
+        task = asyncio.create_task(self._load(key, category, load))
+        self._loading[key] = task
+        task.add_done_callback(lambda _: self._loading.pop(key, None))
+        return task
+    
+    def _refresh_done(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["refresh_errors"] += 1
+            logger.error("Feed cache refresh failed", exc_info=task.exception())
+    
+    def _generation(self, category: str) -> Tuple[int, int]:
+        return self._epoch, self._generations.get(category, 0)
+    
+    async def _load(self, key: Tuple, category: str, load) -> Dict[str, Any]:
+        generation = self._generation(category)
+        entry = dict(await load())
+        now = time.monotonic()
+        fresh = self._generation(category) == generation
+        entry.update({
+            "category": category,
+            "fresh_until": now + self.ttl if fresh else 0.0,
+            "stale_until": now + self.ttl + self.stale_ttl,
+        })
+        self._store(key, entry)
+        return entry
+    
+    def _store(self, key: Tuple, entry: Dict[str, Any]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self._keys_by_category.setdefault(entry["category"], set()).add(key)
+        while len(self._entries) > self.max_size:
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self._keys_by_category[evicted["category"]].discard(evicted_key)
+            self.stats["evictions"] += 1
+    
+    def invalidate(self, category: Optional[str] = None):
+        """Expire the pages a change in a category affects, every page if category is None"""
+        if category is None:
+            self._epoch += 1
+            categories = list(self._keys_by_category)
+        else:
+            # The unfiltered feed contains every category
+            categories = [category, ALL_CATEGORIES]
+            for name in categories:
+                self._generations[name] = self._generations.get(name, 0) + 1
+        for name in categories:
+            for key in self._keys_by_category.get(name, ()):
+                self._entries[key]["fresh_until"] = 0.0
+        self.stats["invalidations"] += 1
+    
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["stale_hits"] + self.stats["misses"] + self.stats["coalesced"]
+        served = self.stats["hits"] + self.stats["stale_hits"]
+        return {
+            "enabled": FEED_CACHE_ENABLED,
+            "size": len(self._entries),
+            "loading": len(self._loading),
+            "hit_ratio": round(served / lookups, 3) if lookups else 0.0,
+            "fresh_hit_ratio": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+            **self.stats,
+        }
+
+feed_cache = FeedCache(FEED_CACHE_SIZE, FEED_CACHE_TTL, FEED_CACHE_STALE_TTL)
+
+async def invalidate_idea_feeds(collection_name: str, idea_ids: List[str]):
+    """Expire the cached feed pages of the categories of some ideas"""
+    if collection_name != "ideas" or not FEED_CACHE_ENABLED:
+        return
+    for category in await db.ideas.distinct("category", {"id": {"$in": idea_ids}}):
+        feed_cache.invalidate(category)
 
 # Authentication Helper Functions
 def verify_password(plain_password, hashed_password):
@@ -184,6 +662,59 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True if a bcrypt hash was made with a different cost than BCRYPT_ROUNDS"""
+    # bcrypt hashes look like $2b$<rounds>$<salt and checksum>
+    parts = hashed_password.split("$")
+    try:
+        rounds = int(parts[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds != BCRYPT_ROUNDS or pwd_context.needs_update(hashed_password)
+
+class PasswordHasher:
+    """Runs bcrypt off the event loop with admission control"""
+    
+    def __init__(self, workers: int, queue_limit: int):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self.queue_limit = queue_limit
+        self.in_flight = 0
+        self.stats = {"completed": 0, "rejected": 0}
+    
+    async def _run(self, func, *args):
+        if self.in_flight >= self.queue_limit:
+            self.stats["rejected"] += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, please try again",
+                headers={"Retry-After": "1"}
+            )
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.in_flight -= 1
+            self.stats["completed"] += 1
+    
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+    
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+    
+    def metrics(self) -> Dict[str, Any]:
+        return {"in_flight": self.in_flight, "queue_limit": self.queue_limit, **self.stats}
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT)
+
+async def rehash_password(user_id: str, password: str):
+    """Re-hash a password with the configured bcrypt cost after a successful login"""
+    try:
+        hashed_password = await password_hasher.hash(password)
+    except HTTPException:
+        return  # pool saturated, try again on the next login
+    await db.users.update_one({"id": user_id}, {"$set": {"hashed_password": hashed_password}})
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -194,24 +725,111 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    credentials_exception = HTTPException(
+# Editable profile fields in the claims token snapshot
+PROFILE_CLAIM_FIELDS = ("full_name", "experience_level")
+
+def token_claims(user: User) -> dict:
+    """JWT claims for a user, with the profile snapshot when claims tokens are enabled"""
+    claims = {"sub": user.id, "ver": user.token_version}
+    if CLAIMS_TOKENS_ENABLED:
+        claims["pv"] = PROFILE_CLAIMS_VERSION
+        claims["prof_ver"] = user.profile_version
+        claims["profile"] = {field: getattr(user, field) for field in PROFILE_CLAIM_FIELDS}
+        claims["profile"]["created_at"] = user.created_at.isoformat()
+    return claims
+
+def issue_access_token(user: User) -> str:
+    return create_access_token(
+        data=token_claims(user), expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+
+def credentials_error() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def decode_access_token(credentials: HTTPAuthorizationCredentials) -> dict:
     try:
         payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
     except jwt.PyJWTError:
-        raise credentials_exception
+        raise credentials_error()
+    if payload.get("sub") is None:
+        raise credentials_error()
+    return payload
+
+# Current (token_version, profile_version) per user, so claims tokens can
+# be revoked and stale profile snapshots detected without reading the user
+# on every request. Changes reach other processes within TOKEN_VERSION_TTL.
+token_version_cache = TTLCache(USER_CACHE_SIZE, TOKEN_VERSION_TTL)
+TOKEN_VERSION_PROJECTION = {"_id": 0, "token_version": 1, "profile_version": 1}
+
+def cache_token_versions(user_id: str, user_doc: dict) -> Tuple[int, int]:
+    versions = (user_doc.get("token_version", 0), user_doc.get("profile_version", 0))
+    token_version_cache.set(user_id, versions)
+    return versions
+
+async def current_token_versions(user_id: str) -> Optional[Tuple[int, int]]:
+    versions = token_version_cache.get(user_id)
+    if versions is not None:
+        return versions
+    
+    user = user_cache.get(user_id)
+    if user is not None:
+        return cache_token_versions(user_id, {"token_version": user.token_version, "profile_version": user.profile_version})
+    user_doc = await db.users.find_one({"id": user_id}, TOKEN_VERSION_PROJECTION)
+    if user_doc is None:
+        return None
+    return cache_token_versions(user_id, user_doc)
+
+async def revoke_user_tokens(user_id: str) -> Optional[dict]:
+    """Invalidate every token issued to a user so far, returns the updated user"""
+    user_doc = await db.users.find_one_and_update(
+        {"id": user_id},
+        {"$inc": {"token_version": 1}},
+        return_document=ReturnDocument.AFTER
+    )
+    user_cache.invalidate(user_id)
+    if user_doc is not None:
+        cache_token_versions(user_id, user_doc)
+    return user_doc
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    payload = decode_access_token(credentials)
+    user_id: str = payload["sub"]
     
-    user = await db.users.find_one({"id": user_id})
+    user = user_cache.get(user_id)
     if user is None:
-        raise credentials_exception
-    return User(**user)
+        user_doc = await db.users.find_one({"id": user_id})
+        if user_doc is None:
+            raise credentials_error()
+        user = User(**user_doc)
+        user_cache.set(user_id, user)
+    
+    # Tokens issued before versioning carry no "ver" and count as version 0,
+    # they stay valid until the user's tokens are first revoked
+    if payload.get("ver", 0) != user.token_version:
+        raise credentials_error()
+    return user
+
+async def get_token_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> TokenUser:
+    """Lightweight get_current_user for endpoints that only need the profile snapshot
+    
+    Claims tokens are trusted as long as their version is current. A token
+    whose snapshot predates a profile edit stays valid but is resolved like
+    any other token, by reading the full user.
+    """
+    payload = decode_access_token(credentials)
+    if payload.get("pv") == PROFILE_CLAIMS_VERSION:
+        versions = await current_token_versions(payload["sub"])
+        if versions is None or versions[0] != payload.get("ver", 0):
+            raise credentials_error()
+        if versions[1] == payload.get("prof_ver"):
+            return TokenUser(id=payload["sub"], token_version=payload["ver"], **payload["profile"])
+    
+    user = await get_current_user(credentials)
+    return TokenUser(**user.dict())
 
 def validate_email(email: str) -> bool:
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
@@ -220,9 +838,121 @@ def validate_email(email: str) -> bool:
 def validate_password(password: str) -> bool:
     return len(password) >= 6
 
-# Helper function to calculate idea scores
-def calculate_idea_scores(votes: List[IdeaVote]) -> Dict[str, float]:
-    if not votes:
+# Stored votes are compact: the vote type and the three 1-5 scores are
+# packed into one int, the user id is a binary UUID and created_at is in
+# epoch seconds. Bits 0-8 hold the scores, three bits each in
+# VOTE_SCORE_FIELDS order, bit 9 is set for upvotes.
+VOTE_SCORE_FIELDS = ["feasibility_score", "market_potential_score", "interest_score"]
+VOTE_SCORE_BITS = 3
+VOTE_UPVOTE_BIT = len(VOTE_SCORE_FIELDS) * VOTE_SCORE_BITS
+EPOCH = datetime(1970, 1, 1)
+
+def pack_vote(vote: Dict[str, Any]) -> int:
+    """The vote type and scores of a vote as one int, ValueError if they do not fit"""
+    if vote["vote_type"] not in ("upvote", "downvote"):
+        raise ValueError(f"Invalid vote type {vote['vote_type']!r}")
+    packed = (1 << VOTE_UPVOTE_BIT) if vote["vote_type"] == "upvote" else 0
+    for i, field in enumerate(VOTE_SCORE_FIELDS):
+        score = vote[field]
+        if type(score) is not int or not MIN_VOTE_SCORE <= score <= MAX_VOTE_SCORE:
+            raise ValueError(f"Invalid {field} {score!r}")
+        packed |= score << (i * VOTE_SCORE_BITS)
+    return packed
+
+def unpack_vote(packed: int) -> Dict[str, Any]:
+    vote: Dict[str, Any] = {"vote_type": "upvote" if packed >> VOTE_UPVOTE_BIT & 1 else "downvote"}
+    for i, field in enumerate(VOTE_SCORE_FIELDS):
+        vote[field] = packed >> (i * VOTE_SCORE_BITS) & ((1 << VOTE_SCORE_BITS) - 1)
+    return vote
+
+def encode_user_id(user_id: str):
+    """Binary UUID of a user id, ids that are not UUIDs are kept as strings"""
+    try:
+        return Binary.from_uuid(uuid.UUID(user_id))
+    except ValueError:
+        return user_id
+
+def decode_user_id(user_id) -> str:
+    return str(user_id.as_uuid()) if isinstance(user_id, Binary) else user_id
+
+def epoch_seconds(at: datetime) -> int:
+    return int((at - EPOCH).total_seconds())
+
+def from_epoch_seconds(seconds: int) -> datetime:
+    return EPOCH + timedelta(seconds=seconds)
+
+def encode_vote(vote: Dict[str, Any], idea_id: str, collection_name: str) -> Dict[str, Any]:
+    """The idea_votes document of a vote given as IdeaVote fields"""
+    return {
+        "idea_id": idea_id,
+        "idea_collection": collection_name,
+        "user_id": encode_user_id(vote["user_id"]),
+        "vote": pack_vote(vote),
+        "created_at": epoch_seconds(vote["created_at"]),
+    }
+
+def decode_vote(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """IdeaVote fields of an idea_votes document, with its idea_id and idea_collection"""
+    vote = {
+        "user_id": decode_user_id(doc["user_id"]),
+        **unpack_vote(doc["vote"]),
+        "created_at": from_epoch_seconds(doc["created_at"]),
+    }
+    for field in ("idea_id", "idea_collection"):
+        if field in doc:
+            vote[field] = doc[field]
+    return vote
+
+# Aggregation expressions over idea_votes documents. They use arithmetic
+# instead of $bitAnd, which needs MongoDB 6.3.
+VOTE_IS_UPVOTE = {"$gte": ["$vote", 1 << VOTE_UPVOTE_BIT]}
+VOTE_TYPE_EXPRESSION = {"$cond": [VOTE_IS_UPVOTE, "upvote", "downvote"]}
+VOTE_SCORE_EXPRESSIONS = {
+    field: {"$toInt": {"$mod": [{"$trunc": {"$divide": ["$vote", 1 << (i * VOTE_SCORE_BITS)]}}, 1 << VOTE_SCORE_BITS]}}
+    for i, field in enumerate(VOTE_SCORE_FIELDS)
+}
+VOTE_CREATED_AT_EXPRESSION = {"$toDate": {"$multiply": ["$created_at", 1000]}}
+
+# Validation score weights
+VOTE_RATIO_WEIGHT = 0.4
+SCORE_AVERAGE_WEIGHT = 0.6
+
+# Running vote counters stored on every idea document. The averages and the
+# validation score are derived from these, so a vote only needs an $inc.
+VOTE_COUNTER_FIELDS = [
+    "total_votes",
+    "upvotes",
+    "downvotes",
+    "feasibility_total",
+    "market_potential_total",
+    "interest_total",
+]
+
+def vote_counter_contribution(vote: Dict[str, Any]) -> Dict[str, int]:
+    """Counter values a single stored vote contributes to its idea"""
+    return {
+        "total_votes": 1,
+        "upvotes": 1 if vote["vote_type"] == "upvote" else 0,
+        "downvotes": 1 if vote["vote_type"] == "downvote" else 0,
+        "feasibility_total": vote["feasibility_score"],
+        "market_potential_total": vote["market_potential_score"],
+        "interest_total": vote["interest_score"],
+    }
+
+def vote_counter_delta(old_vote: Optional[Dict[str, Any]], new_vote: Optional[Dict[str, Any]]) -> Dict[str, int]:
+    """$inc document for adding (no old vote), replacing or withdrawing (no new vote) a vote"""
+    delta = {field: 0 for field in VOTE_COUNTER_FIELDS}
+    if old_vote:
+        for field, value in vote_counter_contribution(old_vote).items():
+            delta[field] -= value
+    if new_vote:
+        for field, value in vote_counter_contribution(new_vote).items():
+            delta[field] += value
+    return delta
+
+def scores_from_counters(counters: Dict[str, Any]) -> Dict[str, float]:
+    total_votes = counters.get("total_votes", 0)
+    if total_votes <= 0:
         return {
             "validation_score": 0.0,
             "total_votes": 0,
@@ -231,18 +961,14 @@ def calculate_idea_scores(votes: List[IdeaVote]) -> Dict[str, float]:
             "avg_interest": 0.0
         }
     
-    total_votes = len(votes)
-    upvotes = len([v for v in votes if v.vote_type == "upvote"])
-    downvotes = len([v for v in votes if v.vote_type == "downvote"])
-    
-    avg_feasibility = sum(v.feasibility_score for v in votes) / total_votes
-    avg_market_potential = sum(v.market_potential_score for v in votes) / total_votes
-    avg_interest = sum(v.interest_score for v in votes) / total_votes
+    avg_feasibility = counters.get("feasibility_total", 0) / total_votes
+    avg_market_potential = counters.get("market_potential_total", 0) / total_votes
+    avg_interest = counters.get("interest_total", 0) / total_votes
     
     # Calculate validation score (weighted average)
-    vote_ratio = upvotes / total_votes if total_votes > 0 else 0
+    vote_ratio = counters.get("upvotes", 0) / total_votes
     score_average = (avg_feasibility + avg_market_potential + avg_interest) / 3
-    validation_score = (vote_ratio * 0.4 + score_average/5 * 0.6) * 100
+    validation_score = (vote_ratio * VOTE_RATIO_WEIGHT + score_average/5 * SCORE_AVERAGE_WEIGHT) * 100
     
     return {
         "validation_score": round(validation_score, 1),
@@ -251,6 +977,1402 @@ def calculate_idea_scores(votes: List[IdeaVote]) -> Dict[str, float]:
         "avg_market_potential": round(avg_market_potential, 1),
         "avg_interest": round(avg_interest, 1)
     }
+
+def _per_vote(field: str) -> Dict[str, Any]:
+    return {"$cond": [{"$gt": ["$total_votes", 0]}, {"$divide": [f"${field}", "$total_votes"]}, 0]}
+
+# Server-side equivalent of scores_from_counters, evaluated inside the update
+DERIVED_SCORE_EXPRESSIONS = {
+    "avg_feasibility": {"$round": [_per_vote("feasibility_total"), 1]},
+    "avg_market_potential": {"$round": [_per_vote("market_potential_total"), 1]},
+    "avg_interest": {"$round": [_per_vote("interest_total"), 1]},
+    "validation_score": {"$round": [{"$multiply": [{"$add": [
+        {"$multiply": [_per_vote("upvotes"), VOTE_RATIO_WEIGHT]},
+        {"$multiply": [
+            {"$divide": [{"$add": [
+                _per_vote("feasibility_total"),
+                _per_vote("market_potential_total"),
+                _per_vote("interest_total"),
+            ]}, 15]},
+            SCORE_AVERAGE_WEIGHT
+        ]},
+    ]}, 100]}, 1]},
+}
+
+def _counter(field: str) -> Dict[str, Any]:
+    return {"$ifNull": [f"${field}", 0]}
+
+# Ranking keys stored on every idea so "hot" and "wilson" sorts can use an
+# index. hot_score is HN-style net votes over age in hours with gravity
+# decay, wilson_score the lower bound of the Wilson confidence interval for
+# the upvote ratio. Both are evaluated on the server, on each vote and by
+# the periodic refresh that applies the time decay.
+RANKING_EXPRESSIONS = {
+    "hot_score": {"$divide": [
+        {"$add": [{"$subtract": [_counter("upvotes"), _counter("downvotes")]}, 1]},
+        {"$pow": [
+            {"$add": [
+                {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$created_at", "$$NOW"]}]}, 3600 * 1000]},
+                2
+            ]},
+            HOT_GRAVITY
+        ]},
+    ]},
+    "wilson_score": {"$let": {
+        "vars": {"n": {"$add": [_counter("upvotes"), _counter("downvotes")]}},
+        "in": {"$cond": [
+            {"$gt": ["$$n", 0]},
+            {"$let": {
+                "vars": {"p": {"$divide": [_counter("upvotes"), "$$n"]}},
+                "in": {"$divide": [
+                    {"$subtract": [
+                        {"$add": ["$$p", {"$divide": [WILSON_Z ** 2, {"$multiply": [2, "$$n"]}]}]},
+                        {"$multiply": [WILSON_Z, {"$sqrt": {"$divide": [
+                            {"$add": [
+                                {"$multiply": ["$$p", {"$subtract": [1, "$$p"]}]},
+                                {"$divide": [WILSON_Z ** 2, {"$multiply": [4, "$$n"]}]}
+                            ]},
+                            "$$n"
+                        ]}}]},
+                    ]},
+                    {"$add": [1, {"$divide": [WILSON_Z ** 2, "$$n"]}]},
+                ]},
+            }},
+            0
+        ]},
+    }},
+}
+
+SCORE_PROJECTION = {
+    "_id": 0,
+    "validation_score": 1,
+    "total_votes": 1,
+    "avg_feasibility": 1,
+    "avg_market_potential": 1,
+    "avg_interest": 1,
+}
+
+def score_update_pipeline(delta: Dict[str, int]) -> List[Dict[str, Any]]:
+    """Update pipeline adding a counter delta and recomputing the derived scores"""
+    return [
+        {"$set": {
+            field: {"$add": [{"$ifNull": [f"${field}", 0]}, delta[field]]}
+            for field in VOTE_COUNTER_FIELDS
+        }},
+        {"$set": DERIVED_SCORE_EXPRESSIONS},
+        {"$set": RANKING_EXPRESSIONS},
+    ]
+
+# Ranking keys of an idea without votes at age zero, stored when an idea is
+# inserted: a range filter on hot_score or wilson_score never matches a
+# document that lacks the field, so cursor pagination could not reach it.
+NEW_IDEA_RANKING = {"hot_score": 1 / 2 ** HOT_GRAVITY, "wilson_score": 0.0}
+
+MISSING_RANKING_FILTER = {"$or": [
+    {"hot_score": {"$exists": False}},
+    {"wilson_score": {"$exists": False}},
+]}
+
+async def backfill_rankings():
+    """Set the ranking keys of ideas inserted or approved without them"""
+    result = await db.ideas.update_many(MISSING_RANKING_FILTER, [{"$set": RANKING_EXPRESSIONS}])
+    await db.submitted_ideas.update_many(
+        {"status": IdeaStatus.APPROVED, **MISSING_RANKING_FILTER},
+        [{"$set": RANKING_EXPRESSIONS}]
+    )
+    if result.modified_count:
+        feed_cache.invalidate()
+
+async def refresh_rankings():
+    """Apply the time decay to the hot_score of recent ideas on the server.
+    
+    wilson_score does not depend on time and is kept current by the vote
+    updates. Ideas older than HOT_REFRESH_MAX_AGE days have decayed to the
+    bottom of the hot feed and keep their last hot_score, so the refresh
+    only rewrites a small, recent slice of the feed indexes. Cached feed
+    pages pick up the new order within FEED_CACHE_TTL. Ideas that reached
+    the feeds without ranking keys, seeded by a script or approved outside
+    the API, get them here too.
+    """
+    await backfill_rankings()
+    cutoff = {"created_at": {"$gte": datetime.utcnow() - timedelta(days=HOT_REFRESH_MAX_AGE)}}
+    update = [{"$set": {"hot_score": RANKING_EXPRESSIONS["hot_score"]}}]
+    await db.ideas.update_many(cutoff, update)
+    await db.submitted_ideas.update_many({"status": IdeaStatus.APPROVED, **cutoff}, update)
+
+async def refresh_rankings_periodically():
+    while True:
+        try:
+            await refresh_rankings()
+        except Exception:
+            logger.exception("Ranking refresh failed")
+        await asyncio.sleep(RANKING_REFRESH_INTERVAL)
+
+async def apply_vote_delta(collection, idea_filter: Dict[str, Any], delta: Dict[str, int]) -> Optional[Dict[str, float]]:
+    """Adjust an idea's vote counters and derived scores in one atomic update.
+    
+    Returns the new scores, or None if no idea matched the filter.
+    """
+    scores = await collection.find_one_and_update(
+        idea_filter,
+        score_update_pipeline(delta),
+        projection={**SCORE_PROJECTION, "category": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if scores is None:
+        return None
+    category = scores.pop("category", None)
+    if collection.name == "ideas":
+        feed_cache.invalidate(category)
+    return scores
+
+# Votes live in their own collection, one document per (idea, user), so idea
+# documents stay a fixed size however many votes they receive.
+VOTE_TARGET_PROJECTION = {"_id": 0, "id": 1, "status": 1, "votes": {"$slice": 1}}
+
+async def record_vote(collection_name: str, idea_id: str, vote: IdeaVote) -> Optional[Dict[str, Any]]:
+    """Store a user's vote on an idea and return the vote it replaced, if any"""
+    vote_doc = encode_vote(vote.dict(), idea_id, collection_name)
+    previous_vote = await db.idea_votes.find_one_and_replace(
+        {"idea_id": idea_id, "user_id": vote_doc["user_id"]},
+        vote_doc,
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    )
+    return decode_vote(previous_vote) if previous_vote else None
+
+async def count_idea_votes(idea_id: str) -> Dict[str, int]:
+    """Rebuild an idea's vote counters from the idea_votes collection"""
+    pipeline = [
+        {"$match": {"idea_id": idea_id}},
+        {"$group": {
+            "_id": None,
+            "total_votes": {"$sum": 1},
+            "upvotes": {"$sum": {"$cond": [VOTE_IS_UPVOTE, 1, 0]}},
+            "downvotes": {"$sum": {"$cond": [VOTE_IS_UPVOTE, 0, 1]}},
+            "feasibility_total": {"$sum": VOTE_SCORE_EXPRESSIONS["feasibility_score"]},
+            "market_potential_total": {"$sum": VOTE_SCORE_EXPRESSIONS["market_potential_score"]},
+            "interest_total": {"$sum": VOTE_SCORE_EXPRESSIONS["interest_score"]},
+        }},
+    ]
+    results = await db.idea_votes.aggregate(pipeline).to_list(1)
+    counters = {field: 0 for field in VOTE_COUNTER_FIELDS}
+    if results:
+        counters.update({field: results[0][field] for field in VOTE_COUNTER_FIELDS})
+    return counters
+
+async def drain_embedded_votes(collection_name: str, idea_id: str):
+    """Move an idea's embedded votes array into idea_votes"""
+    collection = db[collection_name]
+    idea = await collection.find_one({"id": idea_id}, {"_id": 0, "votes": 1})
+    votes = idea.get("votes") if idea else None
+    if not votes:
+        return
+    
+    # $setOnInsert keeps any newer vote already written to idea_votes
+    operations = []
+    for vote in votes:
+        vote_doc = encode_vote(IdeaVote(**vote).dict(), idea_id, collection_name)
+        operations.append(UpdateOne(
+            {"idea_id": idea_id, "user_id": vote_doc["user_id"]},
+            {"$setOnInsert": vote_doc},
+            upsert=True
+        ))
+    await db.idea_votes.bulk_write(operations, ordered=False)
+    
+    await collection.update_one(
+        {"id": idea_id},
+        {"$pull": {"votes": {"user_id": {"$in": [vote["user_id"] for vote in votes]}}}}
+    )
+
+async def rebuild_idea_scores(collection_name: str, idea_id: str) -> Dict[str, float]:
+    """Recount an idea's votes from idea_votes and store the counters and scores"""
+    counters = await count_idea_votes(idea_id)
+    scores = scores_from_counters(counters)
+    idea = await db[collection_name].find_one_and_update(
+        {"id": idea_id},
+        {"$set": {**counters, **scores}},
+        projection={"_id": 0, "category": 1}
+    )
+    if idea is not None and collection_name == "ideas":
+        feed_cache.invalidate(idea.get("category"))
+    return scores
+
+async def restore_vote(idea_id: str, user_id: str, previous_vote: Optional[Dict[str, Any]]):
+    """Roll idea_votes back to the vote a user had before a rejected vote"""
+    vote_filter = {"idea_id": idea_id, "user_id": encode_user_id(user_id)}
+    if previous_vote:
+        await db.idea_votes.replace_one(vote_filter, encode_vote(previous_vote, idea_id, previous_vote["idea_collection"]))
+    else:
+        await db.idea_votes.delete_one(vote_filter)
+
+def check_vote_target(idea: Optional[Dict[str, Any]], required_status: Optional[str] = None):
+    """Reject votes on missing ideas and on ideas that are not open for votes"""
+    if not idea:
+        raise HTTPException(status_code=404, detail="Idea not found")
+    if required_status and idea.get("status") != required_status:
+        raise HTTPException(status_code=400, detail="Can only vote on approved ideas")
+
+async def cast_vote(collection_name: str, idea_id: str, vote: IdeaVote, required_status: Optional[str] = None) -> Dict[str, float]:
+    """Replace a user's vote on an idea and return the idea's new scores.
+    
+    The common path is three round trips: a point read on the idea's unique
+    id that rejects missing or closed ideas before anything is written, the
+    vote upsert, which hands back the replaced vote, and one pipeline update
+    that applies the difference to the counters and recomputes the scores
+    atomically on the server.
+    """
+    idea = await db[collection_name].find_one({"id": idea_id}, VOTE_TARGET_PROJECTION)
+    check_vote_target(idea, required_status)
+    
+    vote_doc = vote.dict()
+    existing_vote = await record_vote(collection_name, idea_id, vote)
+    if idea.get("votes"):
+        # Legacy idea, move its embedded votes out and recount
+        await drain_embedded_votes(collection_name, idea_id)
+        user_stats_recorder.record_vote(collection_name, idea_id, vote.user_id, existing_vote, vote_doc)
+        return await rebuild_idea_scores(collection_name, idea_id)
+    
+    idea_filter = {"id": idea_id}
+    if required_status:
+        idea_filter["status"] = required_status
+    scores = await apply_vote_delta(db[collection_name], idea_filter, vote_counter_delta(existing_vote, vote_doc))
+    if scores is not None:
+        user_stats_recorder.record_vote(collection_name, idea_id, vote.user_id, existing_vote, vote_doc)
+        return scores
+    
+    # The idea was deleted or closed for votes after the read
+    await restore_vote(idea_id, vote.user_id, existing_vote)
+    check_vote_target(await db[collection_name].find_one({"id": idea_id}, VOTE_TARGET_PROJECTION), required_status)
+    raise HTTPException(status_code=409, detail="Idea changed while voting, please try again")
+
+class PeriodicFlusher:
+    """Background task that writes out an in-process queue.
+    
+    flush() runs every flush_interval, or as soon as wake() is called, and
+    drain() stops the task and flushes whatever is left. Subclasses
+    implement flush() and hold _flush_lock while they write.
+    """
+    
+    label = "Queue"  # used in log messages
+    
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+    
+    def wake(self):
+        self._wakeup.set()
+    
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("%s flush failed", self.label)
+    
+    async def flush(self):
+        raise NotImplementedError
+    
+    async def drain(self):
+        """Stop the background task and write out everything still queued"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+class VoteBuffer(PeriodicFlusher):
+    """In-process write-behind buffer for idea votes.
+    
+    Votes are keyed by (idea_id, user_id) so a user re-voting before the next
+    flush simply replaces the pending vote. A background task flushes the
+    buffer whenever it reaches max_size or flush_interval elapses, writing
+    the votes and the idea score updates as two bulk writes.
+    
+    The vote write of a failed flush may have landed in part. The requeued
+    votes keep the stored votes read on the first attempt in previous, so
+    the retry counts them against what the idea counters actually hold
+    rather than against votes it wrote itself.
+    """
+    
+    label = "Vote buffer"
+    
+    def __init__(self, collection_name: str, max_size: int, flush_interval: float):
+        super().__init__(flush_interval)
+        self.collection_name = collection_name
+        self.max_size = max_size
+        self.pending: Dict[Tuple[str, str], IdeaVote] = {}
+        self.previous: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = {}
+        self.stats = {
+            "votes_received": 0,
+            "votes_absorbed": 0,
+            "votes_written": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+        }
+    
+    def add(self, idea_id: str, vote: IdeaVote):
+        key = (idea_id, vote.user_id)
+        self.stats["votes_received"] += 1
+        if key in self.pending:
+            self.stats["votes_absorbed"] += 1
+        self.pending[key] = vote
+        if len(self.pending) >= self.max_size:
+            self.wake()
+    
+    async def discard(self, idea_id: str, user_id: str) -> Tuple[bool, bool, Optional[Dict[str, Any]]]:
+        """Drop a user's buffered vote on an idea.
+        
+        Returns whether there was one, whether a failed flush of it may have
+        stored it without counting it, and if so the vote the counters still
+        count. Waits for a running flush so a vote that is being written
+        lands before the caller deletes the stored vote.
+        """
+        key = (idea_id, user_id)
+        async with self._flush_lock:
+            discarded = self.pending.pop(key, None) is not None
+            uncounted = key in self.previous
+            return discarded, uncounted, self.previous.pop(key, None)
+    
+    def metrics(self) -> Dict[str, Any]:
+        return {"enabled": self._task is not None, "pending": len(self.pending), **self.stats}
+    
+    async def flush(self):
+        async with self._flush_lock:
+            if not self.pending:
+                return
+            batch, self.pending = self.pending, {}
+            previous, self.previous = self.previous, {}
+            self.stats["flushes"] += 1
+            
+            try:
+                await flush_vote_batch(self.collection_name, batch, previous)
+                self.stats["votes_written"] += len(batch)
+            except Exception:
+                self.stats["flush_errors"] += 1
+                # Requeue whatever has not been superseded by a newer vote,
+                # newer votes are counted against the same previous votes
+                for key, vote in batch.items():
+                    self.pending.setdefault(key, vote)
+                    if key in previous:
+                        self.previous[key] = previous[key]
+                raise
+
+async def flush_vote_batch(collection_name: str, batch: Dict[Tuple[str, str], IdeaVote],
+                           previous_votes: Optional[Dict[Tuple[str, str], Optional[Dict[str, Any]]]] = None):
+    """Write a batch of votes and the resulting per-idea score updates in bulk.
+    
+    previous_votes holds the votes the idea counters count for keys known
+    from an earlier attempt, the stored votes of the other keys are read
+    and added to it.
+    """
+    if previous_votes is None:
+        previous_votes = {}
+    unread = [key for key in batch if key not in previous_votes]
+    if unread:
+        stored: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = dict.fromkeys(unread)
+        cursor = db.idea_votes.find(
+            {"$or": [{"idea_id": idea_id, "user_id": encode_user_id(user_id)} for idea_id, user_id in unread]},
+            {"_id": 0}
+        )
+        async for vote_doc in cursor:
+            vote = decode_vote(vote_doc)
+            stored[(vote["idea_id"], vote["user_id"])] = vote
+        previous_votes.update(stored)
+    
+    vote_operations = []
+    idea_deltas: Dict[str, Dict[str, int]] = {}
+    for (idea_id, user_id), vote in batch.items():
+        vote_doc = encode_vote(vote.dict(), idea_id, collection_name)
+        vote_operations.append(ReplaceOne({"idea_id": idea_id, "user_id": vote_doc["user_id"]}, vote_doc, upsert=True))
+        
+        delta = vote_counter_delta(previous_votes.get((idea_id, user_id)), vote.dict())
+        idea_delta = idea_deltas.setdefault(idea_id, {field: 0 for field in VOTE_COUNTER_FIELDS})
+        for field, value in delta.items():
+            idea_delta[field] += value
+    
+    await db.idea_votes.bulk_write(vote_operations, ordered=False)
+    for (idea_id, user_id), vote in batch.items():
+        user_stats_recorder.record_vote(collection_name, idea_id, user_id, previous_votes.get((idea_id, user_id)), vote.dict())
+    try:
+        await db[collection_name].bulk_write([
+            UpdateOne({"id": idea_id}, score_update_pipeline(delta))
+            for idea_id, delta in idea_deltas.items()
+        ], ordered=False)
+        await invalidate_idea_feeds(collection_name, list(idea_deltas))
+    except Exception:
+        # The votes are stored and must not be requeued, recount the
+        # affected ideas from idea_votes instead
+        logger.exception("Bulk score update failed, rebuilding %d ideas", len(idea_deltas))
+        for idea_id in idea_deltas:
+            try:
+                await rebuild_idea_scores(collection_name, idea_id)
+            except Exception:
+                logger.exception("Failed to rebuild %s %s, run rescore_ideas.py --recount", collection_name, idea_id)
+
+vote_buffer = VoteBuffer("ideas", VOTE_BUFFER_MAX_SIZE, VOTE_BUFFER_FLUSH_INTERVAL)
+
+# Reputation points per ledger event reason
+REPUTATION_POINTS = {
+    "upvote": 2,
+    "downvote": 1,
+    "comment": 1,
+    "idea_submission": 5,
+}
+
+def vote_reputation_reason(vote_type: str) -> str:
+    return "upvote" if vote_type == "upvote" else "downvote"
+
+class ReputationLedger(PeriodicFlusher):
+    """Append-only ledger of reputation changes.
+    
+    Write endpoints append an event instead of updating the user document.
+    A background task inserts the queued events into reputation_events and
+    then folds unapplied events into users.reputation_score, one $inc per
+    user per batch, see fold(). The stored events are the audit trail and
+    can be replayed with replay_reputation.py when the point rules change.
+    """
+    
+    label = "Reputation ledger"
+    
+    def __init__(self, flush_interval: float, fold_batch_size: int):
+        super().__init__(flush_interval)
+        self.fold_batch_size = fold_batch_size
+        self.pending: List[Dict[str, Any]] = []
+        self.stats = {
+            "events_appended": 0,
+            "events_written": 0,
+            "events_folded": 0,
+            "fold_errors": 0,
+        }
+    
+    def append(self, user_id: str, reason: str, ref_id: Optional[str] = None):
+        self.pending.append({
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "reason": reason,
+            "points": REPUTATION_POINTS[reason],
+            "ref_id": ref_id,
+            "created_at": datetime.utcnow(),
+            "applied": False,
+        })
+        self.stats["events_appended"] += 1
+    
+    def metrics(self) -> Dict[str, Any]:
+        return {"pending": len(self.pending), **self.stats}
+    
+    async def flush(self):
+        async with self._flush_lock:
+            try:
+                await self._write_and_fold()
+            except Exception:
+                self.stats["fold_errors"] += 1
+                raise
+    
+    async def _write_and_fold(self):
+        if self.pending:
+            events, self.pending = self.pending, []
+            # Upserts keyed on the event id, so requeued events that did
+            # land on an earlier attempt are not inserted twice
+            try:
+                await db.reputation_events.bulk_write([
+                    UpdateOne({"id": event["id"]}, {"$setOnInsert": event}, upsert=True)
+                    for event in events
+                ], ordered=False)
+            except Exception:
+                self.pending = events + self.pending
+                raise
+            self.stats["events_written"] += len(events)
+        
+        while await self.fold() == self.fold_batch_size:
+            pass
+    
+    async def fold(self) -> int:
+        """Apply one batch of unapplied events to the users' reputation scores.
+        
+        Folding is two-phase: the batch is claimed ("claiming" with a
+        batch_id), the points are applied, and only then are the events
+        marked applied. A claim left behind by a failed $inc or a crashed
+        worker is folded again once it is older than
+        REPUTATION_CLAIM_TIMEOUT. Each user remembers the last batch ids
+        applied to them, so folding a batch twice does not count it twice.
+        """
+        now = datetime.utcnow()
+        stale_claim = await db.reputation_events.find_one(
+            {"applied": "claiming", "claimed_at": {"$lt": now - timedelta(seconds=REPUTATION_CLAIM_TIMEOUT)}},
+            {"_id": 0, "batch_id": 1}
+        )
+        if stale_claim:
+            batch_id = stale_claim["batch_id"]
+            await db.reputation_events.update_many(
+                {"batch_id": batch_id, "applied": "claiming"}, {"$set": {"claimed_at": now}}
+            )
+            return await self.apply_batch(batch_id)
+        
+        events = await db.reputation_events.find(
+            {"applied": False}, {"_id": 0, "id": 1}
+        ).sort("created_at", 1).limit(self.fold_batch_size).to_list(self.fold_batch_size)
+        if not events:
+            return 0
+        
+        # Claim the batch first so that another worker cannot fold it as well
+        batch_id = str(uuid.uuid4())
+        await db.reputation_events.update_many(
+            {"id": {"$in": [event["id"] for event in events]}, "applied": False},
+            {"$set": {"applied": "claiming", "batch_id": batch_id, "claimed_at": now}}
+        )
+        await self.apply_batch(batch_id)
+        return len(events)
+    
+    async def apply_batch(self, batch_id: str) -> int:
+        """Add a claimed batch's points to the users and mark its events applied"""
+        claimed = await db.reputation_events.find(
+            {"batch_id": batch_id}, {"_id": 0, "user_id": 1, "points": 1}
+        ).to_list(None)
+        
+        totals: Dict[str, int] = {}
+        for event in claimed:
+            totals[event["user_id"]] = totals.get(event["user_id"], 0) + event["points"]
+        if totals:
+            await db.users.bulk_write([
+                UpdateOne(
+                    {"id": user_id, "reputation_batches": {"$ne": batch_id}},
+                    {
+                        "$inc": {"reputation_score": points},
+                        "$push": {"reputation_batches": {"$each": [batch_id], "$slice": -REPUTATION_BATCH_HISTORY}},
+                    }
+                )
+                for user_id, points in totals.items()
+            ], ordered=False)
+            for user_id in totals:
+                user_cache.invalidate(user_id)
+        
+        await db.reputation_events.update_many(
+            {"batch_id": batch_id},
+            {"$set": {"applied": True, "applied_at": datetime.utcnow()}}
+        )
+        self.stats["events_folded"] += len(claimed)
+        return len(claimed)
+
+reputation_ledger = ReputationLedger(REPUTATION_FLUSH_INTERVAL, REPUTATION_FOLD_BATCH_SIZE)
+
+# Per-user dashboard stats, one user_stats document per user
+RECENT_ACTIVITY_LIMIT = 5
+RECENT_STATS_LIMIT = 2 * RECENT_ACTIVITY_LIMIT  # spare entries for withdrawn votes and deleted ideas
+VOTE_TYPE_COUNTERS = {"upvote": "upvotes", "downvote": "downvotes"}
+
+def category_key(category: Optional[str]) -> str:
+    """Categories are stored as field names, keep them free of path characters"""
+    return (category or "Other").replace(".", "_").replace("$", "_")
+
+def comment_preview(content: str) -> str:
+    return content[:100] + "..." if len(content) > 100 else content
+
+# Activity rollups, one user_activity_rollups document per user and period
+ROLLUP_GRANULARITIES = {"month": "%Y-%m", "day": "%Y-%m-%d"}
+SCORE_BUCKETS = ["1", "2", "3", "4", "5"]
+
+def vote_score_bucket(vote: Dict[str, Any]) -> str:
+    """The rounded average of a vote's three scores"""
+    return str(round((vote["feasibility_score"] + vote["market_potential_score"] + vote["interest_score"]) / 3))
+
+def add_rollup_counts(rollups: Dict[Tuple[str, str, str], Dict[str, int]], user_id: str, at: datetime, counts: Dict[str, int]):
+    """Add counts to the day and month rollups of a timestamp"""
+    for granularity, period_format in ROLLUP_GRANULARITIES.items():
+        rollup = rollups.setdefault((user_id, granularity, at.strftime(period_format)), {})
+        for field, value in counts.items():
+            rollup[field] = rollup.get(field, 0) + value
+
+def vote_rollup_counts(vote: Dict[str, Any], category: Optional[str], sign: int) -> Dict[str, int]:
+    return {
+        "votes": sign,
+        "category_votes." + category_key(category): sign,
+        "score_votes." + vote["score"]: sign,
+    }
+
+# Active days, one bit per day in 64-day words keyed by word number. A user
+# only has words for the stretches of time they were active in.
+ACTIVITY_EPOCH = datetime(1970, 1, 1)
+ACTIVITY_WORD_BITS = 64
+
+def activity_day(at: datetime) -> int:
+    """Number of the UTC day of a timestamp"""
+    return (at - ACTIVITY_EPOCH).days
+
+def activity_day_masks(days) -> Dict[str, int]:
+    """One OR mask per word for a set of day numbers"""
+    masks: Dict[str, int] = {}
+    for day in days:
+        word, bit = divmod(day, ACTIVITY_WORD_BITS)
+        masks[str(word)] = masks.get(str(word), 0) | (1 << bit)
+    return masks
+
+def to_int64(mask: int) -> Int64:
+    """Store a 64-bit mask as the signed int64 $bit operates on"""
+    return Int64(mask - (1 << 64) if mask >= (1 << 63) else mask)
+
+def activity_summary(words: Dict[str, int], today: datetime) -> Dict[str, int]:
+    """active_days, current_streak and longest_streak from the activity words"""
+    bits = 0
+    for word, value in words.items():
+        bits |= (value & ((1 << 64) - 1)) << (int(word) * ACTIVITY_WORD_BITS)
+    if not bits:
+        return {"active_days": 0, "current_streak": 0, "longest_streak": 0}
+    
+    # The current streak runs back from today, or from yesterday if today is still open
+    day = activity_day(today)
+    if not bits >> day & 1:
+        day -= 1
+    gaps = ~bits & ((1 << (day + 1)) - 1)
+    current_streak = day + 1 - gaps.bit_length()
+    
+    runs = bin(bits)[2:].split("0")
+    return {
+        "active_days": bin(bits).count("1"),
+        "current_streak": current_streak,
+        "longest_streak": max(len(run) for run in runs),
+    }
+
+async def rebuild_activity_days(user_id: str):
+    """Recompute a user's active days from the timestamps in the source collections"""
+    results = await asyncio.gather(*(
+        db[collection_name].aggregate([
+            {"$match": match},
+            {"$group": {"_id": {"$dateToString": {"format": ROLLUP_GRANULARITIES["day"], "date": created_at}}}},
+        ]).to_list(None)
+        for collection_name, match, created_at in [
+            ("idea_votes", {"user_id": encode_user_id(user_id), "idea_collection": "ideas"}, VOTE_CREATED_AT_EXPRESSION),
+            ("idea_comments", {"user_id": user_id, "idea_collection": "ideas"}, "$created_at"),
+            ("submitted_ideas", {"submitter_id": user_id}, "$created_at"),
+        ]
+    ))
+    days = {
+        activity_day(datetime.strptime(row["_id"], ROLLUP_GRANULARITIES["day"]))
+        for rows in results for row in rows
+    }
+    words = {word: to_int64(mask) for word, mask in activity_day_masks(days).items()}
+    await db.user_activity_days.replace_one({"user_id": user_id}, {"user_id": user_id, "words": words}, upsert=True)
+
+async def rebuild_activity_rollups(user_id: str):
+    """Recompute a user's activity rollups from idea_votes and idea_comments"""
+    day = {"$dateToString": {"format": ROLLUP_GRANULARITIES["day"], "date": "$created_at"}}
+    vote_rows, comment_rows = await asyncio.gather(
+        db.idea_votes.aggregate([
+            {"$match": {"user_id": encode_user_id(user_id), "idea_collection": "ideas"}},
+            *idea_lookup("category"),
+            {"$unwind": {"path": "$idea", "preserveNullAndEmptyArrays": True}},
+            {"$group": {
+                "_id": {
+                    "day": {"$dateToString": {"format": ROLLUP_GRANULARITIES["day"], "date": VOTE_CREATED_AT_EXPRESSION}},
+                    "category": {"$ifNull": ["$idea.category", "Other"]},
+                    "score": {"$round": [{"$avg": list(VOTE_SCORE_EXPRESSIONS.values())}, 0]},
+                },
+                "count": {"$sum": 1},
+            }},
+        ]).to_list(None),
+        db.idea_comments.aggregate([
+            {"$match": {"user_id": user_id, "idea_collection": "ideas"}},
+            {"$group": {"_id": {"day": day}, "count": {"$sum": 1}}},
+        ]).to_list(None),
+    )
+    
+    rollups: Dict[Tuple[str, str, str], Dict[str, int]] = {}
+    for row in vote_rows:
+        at = datetime.strptime(row["_id"]["day"], ROLLUP_GRANULARITIES["day"])
+        add_rollup_counts(rollups, user_id, at, {
+            "votes": row["count"],
+            "category_votes." + category_key(row["_id"]["category"]): row["count"],
+            "score_votes." + str(int(row["_id"]["score"])): row["count"],
+        })
+    for row in comment_rows:
+        at = datetime.strptime(row["_id"]["day"], ROLLUP_GRANULARITIES["day"])
+        add_rollup_counts(rollups, user_id, at, {"comments": row["count"]})
+    
+    documents = []
+    for (_, granularity, period), counts in rollups.items():
+        document = {"user_id": user_id, "granularity": granularity, "period": period, "category_votes": {}, "score_votes": {}}
+        for field, value in counts.items():
+            if "." in field:
+                group, key = field.split(".", 1)
+                document[group][key] = value
+            else:
+                document[field] = value
+        documents.append(document)
+    
+    await db.user_activity_rollups.delete_many({"user_id": user_id})
+    if documents:
+        await db.user_activity_rollups.insert_many(documents, ordered=False)
+
+def idea_lookup(*fields: str) -> List[dict]:
+    """$lookup stage joining the idea of a vote or comment, with only the given fields"""
+    return [{
+        "$lookup": {
+            "from": "ideas",
+            "let": {"idea_id": "$idea_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$id", "$$idea_id"]}}},
+                {"$project": {"_id": 0, **{field: 1 for field in fields}}},
+            ],
+            "as": "idea",
+        }
+    }]
+
+def count_if(expression: dict) -> dict:
+    return {"$sum": {"$cond": [expression, 1, 0]}}
+
+async def aggregate_one(collection, pipeline: List[dict]) -> dict:
+    """Run a pipeline ending in $facet, which always yields exactly one document"""
+    result = await collection.aggregate(pipeline).to_list(1)
+    return result[0]
+
+def activity_span(facet: dict) -> List[datetime]:
+    return [facet["span"][0][bound] for bound in ("first", "last")] if facet["span"] else []
+
+SPAN_FACET = [{"$group": {"_id": None, "first": {"$min": "$created_at"}, "last": {"$max": "$created_at"}}}]
+
+async def get_vote_activity(user_id: str) -> dict:
+    """Vote counts per type and category and the most recent votes of a user"""
+    facet = await aggregate_one(db.idea_votes, [
+        {"$match": {"user_id": encode_user_id(user_id), "idea_collection": "ideas"}},
+        {"$facet": {
+            "categories": [
+                *idea_lookup("category"),
+                {"$unwind": {"path": "$idea", "preserveNullAndEmptyArrays": True}},
+                {"$group": {
+                    "_id": {"$ifNull": ["$idea.category", "Other"]},
+                    "count": {"$sum": 1},
+                    "upvotes": count_if(VOTE_IS_UPVOTE),
+                    "downvotes": count_if({"$not": [VOTE_IS_UPVOTE]}),
+                }},
+            ],
+            "span": SPAN_FACET,
+            "recent": [
+                {"$sort": {"created_at": -1}},
+                {"$limit": RECENT_STATS_LIMIT},
+                *idea_lookup("title"),
+                {"$unwind": "$idea"},  # skip votes on deleted ideas
+                {"$project": {
+                    "_id": 0,
+                    "idea_id": 1,
+                    "idea_title": "$idea.title",
+                    "vote_type": VOTE_TYPE_EXPRESSION,
+                    "voted_at": VOTE_CREATED_AT_EXPRESSION,
+                }},
+            ],
+        }},
+    ])
+    category_votes: Dict[str, int] = {}
+    for row in facet["categories"]:
+        key = category_key(row["_id"])
+        category_votes[key] = category_votes.get(key, 0) + row["count"]
+    return {
+        "total_votes": sum(row["count"] for row in facet["categories"]),
+        "upvotes": sum(row["upvotes"] for row in facet["categories"]),
+        "downvotes": sum(row["downvotes"] for row in facet["categories"]),
+        "category_votes": category_votes,
+        "span": [from_epoch_seconds(seconds) for seconds in activity_span(facet)],
+        "recent": facet["recent"],
+    }
+
+async def get_comment_activity(user_id: str) -> dict:
+    """Comment count and the most recent comments of a user"""
+    facet = await aggregate_one(db.idea_comments, [
+        {"$match": {"user_id": user_id, "idea_collection": "ideas"}},
+        {"$facet": {
+            "totals": [{"$count": "total_comments"}],
+            "span": SPAN_FACET,
+            "recent": [
+                {"$sort": {"created_at": -1}},
+                {"$limit": RECENT_STATS_LIMIT},
+                *idea_lookup("title"),
+                {"$unwind": "$idea"},  # skip comments on deleted ideas
+                {"$project": {
+                    "_id": 0,
+                    "comment_id": "$id",
+                    "idea_id": 1,
+                    "idea_title": "$idea.title",
+                    "content": 1,
+                    "commented_at": "$created_at",
+                }},
+            ],
+        }},
+    ])
+    for comment in facet["recent"]:
+        comment["comment_preview"] = comment_preview(comment.pop("content"))
+    return {
+        "total_comments": facet["totals"][0]["total_comments"] if facet["totals"] else 0,
+        "span": activity_span(facet),
+        "recent": facet["recent"],
+    }
+
+async def get_submission_activity(user_id: str) -> dict:
+    """Submission count and the most recently submitted ideas of a user"""
+    facet = await aggregate_one(db.submitted_ideas, [
+        {"$match": {"submitter_id": user_id}},
+        {"$facet": {
+            "totals": [{"$count": "total_submitted_ideas"}],
+            "span": SPAN_FACET,
+            "recent": [
+                {"$sort": {"created_at": -1}},
+                {"$limit": RECENT_STATS_LIMIT},
+                {"$project": {
+                    "_id": 0,
+                    "idea_id": "$id",
+                    "idea_title": "$title",
+                    "status": 1,
+                    "submitted_at": "$created_at",
+                }},
+            ],
+        }},
+    ])
+    return {
+        "total_submitted_ideas": facet["totals"][0]["total_submitted_ideas"] if facet["totals"] else 0,
+        "span": activity_span(facet),
+        "recent": facet["recent"],
+    }
+
+async def rebuild_user_stats(user_id: str) -> Dict[str, Any]:
+    """Recompute a user's stats document, activity rollups and active days from the source collections"""
+    votes, comments, submitted, _, _ = await asyncio.gather(
+        get_vote_activity(user_id),
+        get_comment_activity(user_id),
+        get_submission_activity(user_id),
+        rebuild_activity_rollups(user_id),
+        rebuild_activity_days(user_id),
+    )
+    span = votes["span"] + comments["span"] + submitted["span"]
+    stats = {
+        "user_id": user_id,
+        "total_votes": votes["total_votes"],
+        "upvotes": votes["upvotes"],
+        "downvotes": votes["downvotes"],
+        "total_comments": comments["total_comments"],
+        "total_submitted_ideas": submitted["total_submitted_ideas"],
+        "category_votes": votes["category_votes"],
+        "first_activity_at": min(span) if span else None,
+        "last_activity_at": max(span) if span else None,
+        "recent_votes": votes["recent"],
+        "recent_comments": comments["recent"],
+        "recent_submissions": submitted["recent"],
+        "rebuilt_at": datetime.utcnow(),
+    }
+    await db.user_stats.replace_one({"user_id": user_id}, stats, upsert=True)
+    return stats
+
+class UserStatsDelta:
+    """One user's activity within a user_stats flush, applied as a single pipeline upsert"""
+    
+    # Key and timestamp field of the entries of each recent activity list
+    RECENT_KEYS = {
+        "recent_votes": ("idea_id", "voted_at"),
+        "recent_comments": ("comment_id", "commented_at"),
+        "recent_submissions": ("idea_id", "submitted_at"),
+    }
+    
+    def __init__(self):
+        self.counters: Dict[str, int] = {}
+        self.activity: List[datetime] = []
+        # Newest entry per key, None for entries to remove
+        self.recent: Dict[str, Dict[str, Optional[dict]]] = {field: {} for field in self.RECENT_KEYS}
+        self.renamed_submissions: Dict[str, str] = {}
+    
+    def count(self, field: Optional[str], value: int):
+        if field:
+            self.counters[field] = self.counters.get(field, 0) + value
+    
+    def add_vote(self, event: Dict[str, Any], idea: Optional[dict]):
+        category_field = "category_votes." + category_key(idea.get("category") if idea else None)
+        if event["previous_type"] is None:
+            self.count("total_votes", 1)
+            self.count(category_field, 1)
+        else:
+            self.count(VOTE_TYPE_COUNTERS.get(event["previous_type"]), -1)
+        
+        if event["vote_type"] is None:
+            self.count("total_votes", -1)
+            self.count(category_field, -1)
+            self.recent["recent_votes"][event["idea_id"]] = None
+            return
+        
+        self.count(VOTE_TYPE_COUNTERS.get(event["vote_type"]), 1)
+        self.activity.append(event["at"])
+        self.recent["recent_votes"][event["idea_id"]] = {
+            "idea_id": event["idea_id"],
+            "idea_title": idea["title"],
+            "vote_type": event["vote_type"],
+            "voted_at": event["at"],
+        } if idea else None
+    
+    def add_comment(self, event: Dict[str, Any], idea: Optional[dict]):
+        self.count("total_comments", 1)
+        self.activity.append(event["at"])
+        if idea:
+            self.recent["recent_comments"][event["comment_id"]] = {
+                "comment_id": event["comment_id"],
+                "idea_id": event["idea_id"],
+                "idea_title": idea["title"],
+                "comment_preview": event["preview"],
+                "commented_at": event["at"],
+            }
+    
+    def add_submission(self, event: Dict[str, Any]):
+        if event["change"] == "deleted":
+            self.count("total_submitted_ideas", -1)
+            self.recent["recent_submissions"][event["idea_id"]] = None
+        elif event["change"] == "updated":
+            self.renamed_submissions[event["idea_id"]] = event["title"]
+        else:
+            self.count("total_submitted_ideas", 1)
+            self.activity.append(event["at"])
+            self.recent["recent_submissions"][event["idea_id"]] = {
+                "idea_id": event["idea_id"],
+                "idea_title": event["title"],
+                "status": event["status"],
+                "submitted_at": event["at"],
+            }
+    
+    def recent_list(self, field: str) -> dict:
+        """Prepend the new entries to a recent list, dropping the entries they replace"""
+        key, timestamp = self.RECENT_KEYS[field]
+        entries = self.recent[field]
+        added = sorted((entry for entry in entries.values() if entry), key=lambda entry: entry[timestamp], reverse=True)
+        existing = {"$filter": {
+            "input": {"$ifNull": ["$" + field, []]},
+            "as": "entry",
+            "cond": {"$not": [{"$in": ["$$entry." + key, {"$literal": list(entries)}]}]},
+        }}
+        if field == "recent_submissions" and self.renamed_submissions:
+            existing = {"$map": {
+                "input": existing,
+                "as": "entry",
+                "in": {"$switch": {
+                    "branches": [
+                        {
+                            "case": {"$eq": ["$$entry.idea_id", idea_id]},
+                            "then": {"$mergeObjects": ["$$entry", {"idea_title": {"$literal": title}}]},
+                        }
+                        for idea_id, title in self.renamed_submissions.items()
+                    ],
+                    "default": "$$entry",
+                }},
+            }}
+        return {"$slice": [{"$concatArrays": [{"$literal": added}, existing]}, RECENT_STATS_LIMIT]}
+    
+    def pipeline(self) -> List[dict]:
+        update: Dict[str, Any] = {
+            field: {"$add": [{"$ifNull": ["$" + field, 0]}, value]}
+            for field, value in self.counters.items()
+        }
+        if self.activity:
+            update["first_activity_at"] = {"$min": ["$first_activity_at", min(self.activity)]}
+            update["last_activity_at"] = {"$max": ["$last_activity_at", max(self.activity)]}
+        for field, entries in self.recent.items():
+            if entries or (field == "recent_submissions" and self.renamed_submissions):
+                update[field] = self.recent_list(field)
+        return [{"$set": update}]
+
+class UserStatsRecorder(PeriodicFlusher):
+    """Keeps the user_stats documents and activity rollups up to date.
+    
+    Endpoints record their votes, comments and submissions here. A
+    background task folds them into user_stats with one pipeline upsert per
+    user, into user_activity_rollups with one $inc upsert per user and
+    period and into user_activity_days with one $bit upsert per user,
+    reading the titles and categories of the ideas involved in a single
+    query. Like the dashboard, only activity on the curated ideas counts.
+    
+    The three bulk writes of a flush are retried separately, a failed one
+    is kept as it is and written again on the next flush. The user_stats
+    and rollup updates carry the flush id and skip documents that already
+    list it, so a retried write never counts an event twice; the $bit ORs
+    are idempotent as they are.
+    
+    A user's documents are rebuilt from the source collections the first
+    time the stats are read, so history from before they existed is picked
+    up. rebuild_user_stats.py rebuilds every user.
+    """
+    
+    label = "User stats"
+    
+    def __init__(self, flush_interval: float):
+        super().__init__(flush_interval)
+        self.pending: List[Dict[str, Any]] = []
+        self.unwritten: List[Tuple[str, List[UpdateOne]]] = []  # (collection, operations) to retry
+        self.stats = {
+            "events_recorded": 0,
+            "users_written": 0,
+            "rollups_written": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+        }
+    
+    @staticmethod
+    def add_vote_rollups(rollups: Dict[Tuple[str, str, str], Dict[str, int]], event: Dict[str, Any], idea: Optional[dict]):
+        """Move a replaced or withdrawn vote out of its periods and count the new one"""
+        category = idea.get("category") if idea else None
+        if event["previous_type"] is not None:
+            previous = {"score": event["previous_score"]}
+            add_rollup_counts(rollups, event["user_id"], event["previous_at"], vote_rollup_counts(previous, category, -1))
+        if event["vote_type"] is not None:
+            add_rollup_counts(rollups, event["user_id"], event["at"], vote_rollup_counts(event, category, 1))
+    
+    def _record(self, event: Dict[str, Any]):
+        self.pending.append(event)
+        self.stats["events_recorded"] += 1
+    
+    def record_vote(self, collection_name: str, idea_id: str, user_id: str,
+                    previous_vote: Optional[Dict[str, Any]], vote: Optional[Dict[str, Any]]):
+        """Record a new, changed (both votes given) or withdrawn (vote is None) vote"""
+        if collection_name != "ideas":
+            return
+        self._record({
+            "kind": "vote",
+            "user_id": user_id,
+            "idea_id": idea_id,
+            "previous_type": previous_vote["vote_type"] if previous_vote else None,
+            "previous_at": previous_vote["created_at"] if previous_vote else None,
+            "previous_score": vote_score_bucket(previous_vote) if previous_vote else None,
+            "vote_type": vote["vote_type"] if vote else None,
+            "score": vote_score_bucket(vote) if vote else None,
+            "at": vote["created_at"] if vote else datetime.utcnow(),
+        })
+    
+    def record_comment(self, collection_name: str, idea_id: str, comment: IdeaComment):
+        if collection_name != "ideas":
+            return
+        self._record({
+            "kind": "comment",
+            "user_id": comment.user_id,
+            "idea_id": idea_id,
+            "comment_id": comment.id,
+            "preview": comment_preview(comment.content),
+            "at": comment.created_at,
+        })
+    
+    def record_submission(self, idea: Dict[str, Any], change: str = "created"):
+        """Record a submitted idea being created, updated or deleted"""
+        self._record({
+            "kind": "submission",
+            "user_id": idea["submitter_id"],
+            "idea_id": idea["id"],
+            "title": idea["title"],
+            "status": idea["status"],
+            "change": change,
+            "at": idea["created_at"],
+        })
+    
+    def metrics(self) -> Dict[str, Any]:
+        return {"pending": len(self.pending), "unwritten": len(self.unwritten), **self.stats}
+    
+    async def flush(self):
+        async with self._flush_lock:
+            if self.pending:
+                events, self.pending = self.pending, []
+                self.stats["flushes"] += 1
+                try:
+                    self.unwritten.extend(await self.build_writes(events))
+                except Exception:
+                    self.stats["flush_errors"] += 1
+                    self.pending = events + self.pending
+                    raise
+            
+            writes, self.unwritten = self.unwritten, []
+            error = None
+            for collection_name, operations in writes:
+                try:
+                    await write_user_stats(collection_name, operations)
+                except Exception as e:
+                    error = e
+                    self.unwritten.append((collection_name, operations))
+                    continue
+                if collection_name == "user_stats":
+                    self.stats["users_written"] += len(operations)
+                elif collection_name == "user_activity_rollups":
+                    self.stats["rollups_written"] += len(operations)
+            if error is not None:
+                self.stats["flush_errors"] += 1
+                raise error
+    
+    async def build_writes(self, events: List[Dict[str, Any]]) -> List[Tuple[str, List[UpdateOne]]]:
+        """The bulk writes folding a batch of events in, per collection"""
+        idea_ids = list({event["idea_id"] for event in events if event["kind"] != "submission"})
+        ideas = {}
+        if idea_ids:
+            cursor = db.ideas.find({"id": {"$in": idea_ids}}, {"_id": 0, "id": 1, "title": 1, "category": 1})
+            ideas = {idea["id"]: idea async for idea in cursor}
+        
+        deltas: Dict[str, UserStatsDelta] = {}
+        rollups: Dict[Tuple[str, str, str], Dict[str, int]] = {}
+        for event in events:
+            delta = deltas.setdefault(event["user_id"], UserStatsDelta())
+            if event["kind"] == "vote":
+                idea = ideas.get(event["idea_id"])
+                delta.add_vote(event, idea)
+                self.add_vote_rollups(rollups, event, idea)
+            elif event["kind"] == "comment":
+                delta.add_comment(event, ideas.get(event["idea_id"]))
+                add_rollup_counts(rollups, event["user_id"], event["at"], {"comments": 1})
+            else:
+                delta.add_submission(event)
+        
+        flush_id = str(uuid.uuid4())
+        not_applied = {"flush_ids": {"$ne": flush_id}}
+        stats_operations = [
+            UpdateOne(
+                {"user_id": user_id, **not_applied},
+                delta.pipeline() + [{"$set": {"flush_ids": {"$slice": [
+                    {"$concatArrays": [{"$ifNull": ["$flush_ids", []]}, [flush_id]]},
+                    -USER_STATS_FLUSH_HISTORY
+                ]}}}],
+                upsert=True
+            )
+            for user_id, delta in deltas.items()
+        ]
+        
+        rollup_operations = []
+        for (user_id, granularity, period), counts in rollups.items():
+            counts = {field: value for field, value in counts.items() if value}
+            if counts:
+                rollup_operations.append(UpdateOne(
+                    {"user_id": user_id, "granularity": granularity, "period": period, **not_applied},
+                    {
+                        "$inc": counts,
+                        "$push": {"flush_ids": {"$each": [flush_id], "$slice": -USER_STATS_FLUSH_HISTORY}},
+                    },
+                    upsert=True
+                ))
+        
+        day_operations = [
+            UpdateOne(
+                {"user_id": user_id},
+                {"$bit": {
+                    "words." + word: {"or": to_int64(mask)}
+                    for word, mask in activity_day_masks(map(activity_day, delta.activity)).items()
+                }},
+                upsert=True
+            )
+            for user_id, delta in deltas.items() if delta.activity
+        ]
+        
+        writes = [
+            ("user_stats", stats_operations),
+            ("user_activity_rollups", rollup_operations),
+            ("user_activity_days", day_operations),
+        ]
+        return [(collection_name, operations) for collection_name, operations in writes if operations]
+
+user_stats_recorder = UserStatsRecorder(USER_STATS_FLUSH_INTERVAL)
+
+DUPLICATE_KEY_ERROR = 11000
+
+async def write_user_stats(collection_name: str, operations: List[UpdateOne]):
+    """Run one of a flush's bulk writes, tolerating updates it already applied.
+    
+    An upsert whose document already lists the flush id does not match, so
+    it tries to insert a second document for the same unique key. That
+    duplicate key error means the update landed on an earlier attempt.
+    """
+    try:
+        await db[collection_name].bulk_write(operations, ordered=False)
+    except BulkWriteError as error:
+        details = error.details
+        if details.get("writeConcernErrors") or any(e["code"] != DUPLICATE_KEY_ERROR for e in details["writeErrors"]):
+            raise
+
+def user_stats_built(stats: Optional[Dict[str, Any]]) -> bool:
+    """False until a user's stats have been rebuilt once from the source collections"""
+    return stats is not None and "rebuilt_at" in stats
+
+async def backfill_user_stats(user_id: str) -> Dict[str, Any]:
+    """Fold a user's existing history into user_stats on its first read"""
+    # Flush first so no queued activity is counted twice
+    await user_stats_recorder.flush()
+    return await rebuild_user_stats(user_id)
+
+async def drain_all_embedded_votes():
+    """Background migration of every remaining embedded votes array"""
+    for collection_name in ["ideas", "submitted_ideas"]:
+        drained = 0
+        cursor = db[collection_name].find({"votes.0": {"$exists": True}}, {"_id": 0, "id": 1})
+        async for idea in cursor:
+            try:
+                await drain_embedded_votes(collection_name, idea["id"])
+                await rebuild_idea_scores(collection_name, idea["id"])
+                drained += 1
+            except Exception:
+                logger.exception("Failed to migrate votes for %s %s", collection_name, idea["id"])
+        if drained:
+            logger.info("Migrated embedded votes of %d %s", drained, collection_name)
+
+# Opaque pagination cursors: the sort key values of the last item returned
+def encode_cursor(values: List[Any]) -> str:
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+# Sort values a cursor may carry. The values are spliced into the page
+# filter, so anything else (a document with query operators, a regex) is
+# rejected rather than passed on to MongoDB.
+CURSOR_SORT_TYPES = (int, float, datetime, type(None))
+
+def decode_cursor(cursor: str, sort_types: Tuple[type, ...] = CURSOR_SORT_TYPES) -> Tuple[Any, str]:
+    """The (sort value, id) pair encoded in a cursor"""
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != 2:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    sort_value, last_id = values
+    if isinstance(sort_value, bool) or not isinstance(sort_value, sort_types) or not isinstance(last_id, str):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return sort_value, last_id
+
+# Feed sort_by options and the stored field each one sorts on. Feeds sort on
+# (field, id) descending so that every position has a unique keyset cursor.
+FEED_SORT_FIELDS = {
+    "validation_score": "validation_score",
+    "created_at": "created_at",
+    "total_votes": "total_votes",
+    "hot": "hot_score",
+    "wilson": "wilson_score",
+}
+
+async def find_feed_page(
+    collection,
+    query: Dict[str, Any],
+    sort_field: str,
+    limit: int,
+    skip: int = 0,
+    cursor: Optional[str] = None,
+    projection: Optional[Dict[str, Any]] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One page of a feed and the cursor of the next page.
+    
+    With a cursor the page starts right after the (sort value, id) it encodes,
+    which the compound feed indexes serve without walking the skipped entries.
+    skip is only honoured when no cursor is given.
+    """
+    query = dict(query)
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor)
+        query["$or"] = [
+            {sort_field: {"$lt": sort_value}},
+            {sort_field: sort_value, "id": {"$lt": last_id}},
+        ]
+        skip = 0
+    if projection is not None:
+        projection = {**projection, sort_field: 1}
+    
+    docs = await collection.find(query, projection).sort(
+        [(sort_field, -1), ("id", -1)]
+    ).skip(skip).limit(limit + 1).to_list(limit + 1)
+    
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor([docs[-1].get(sort_field), docs[-1]["id"]])
+    return docs, next_cursor
+
+# Comments live in idea_comments, indexed by (idea_id, created_at, id), and
+# idea documents only keep a comment_count.
+COMMENT_PROJECTION = {"_id": 0, "idea_id": 0, "idea_collection": 0}
+
+async def get_comment_page(idea_id: str, after: Optional[str] = None, limit: int = COMMENT_PAGE_SIZE) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One page of an idea's comments, oldest first, and the cursor of the next page"""
+    query: Dict[str, Any] = {"idea_id": idea_id}
+    if after:
+        created_at, comment_id = decode_cursor(after, (datetime,))
+        query["$or"] = [
+            {"created_at": {"$gt": created_at}},
+            {"created_at": created_at, "id": {"$gt": comment_id}},
+        ]
+    
+    comments = await db.idea_comments.find(query, COMMENT_PROJECTION).sort(
+        [("created_at", 1), ("id", 1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    
+    next_cursor = None
+    if len(comments) > limit:
+        comments = comments[:limit]
+        next_cursor = encode_cursor([comments[-1]["created_at"], comments[-1]["id"]])
+    return comments, next_cursor
+
+async def add_comment(collection_name: str, idea_filter: Dict[str, Any], comment: IdeaComment) -> bool:
+    """Store a comment and bump the idea's comment_count, False if no idea matched"""
+    idea = await db[collection_name].find_one_and_update(
+        idea_filter,
+        {"$inc": {"comment_count": 1}},
+        projection={"_id": 0, "category": 1}
+    )
+    if idea is None:
+        return False
+    if collection_name == "ideas":
+        feed_cache.invalidate(idea.get("category"))
+    comment_doc = comment.dict()
+    comment_doc.update({"idea_id": idea_filter["id"], "idea_collection": collection_name})
+    await db.idea_comments.insert_one(comment_doc)
+    return True
+
+async def drain_embedded_comments(collection_name: str, idea_id: str) -> Optional[int]:
+    """Move an idea's embedded comments array into idea_comments, returns the new comment_count"""
+    collection = db[collection_name]
+    idea = await collection.find_one({"id": idea_id}, {"_id": 0, "comments": 1})
+    comments = idea.get("comments") if idea else None
+    if not comments:
+        return None
+    
+    operations = []
+    for comment in comments:
+        comment_doc = IdeaComment(**comment).dict()
+        comment_doc.update({"idea_id": idea_id, "idea_collection": collection_name})
+        operations.append(UpdateOne({"id": comment_doc["id"]}, {"$setOnInsert": comment_doc}, upsert=True))
+    await db.idea_comments.bulk_write(operations, ordered=False)
+    
+    comment_count = await db.idea_comments.count_documents({"idea_id": idea_id})
+    await collection.update_one(
+        {"id": idea_id},
+        {
+            "$pull": {"comments": {"id": {"$in": [comment["id"] for comment in comments]}}},
+            "$set": {"comment_count": comment_count},
+        }
+    )
+    return comment_count
+
+async def drain_all_embedded_comments():
+    """Background migration of every remaining embedded comments array"""
+    for collection_name in ["ideas", "submitted_ideas"]:
+        drained = 0
+        cursor = db[collection_name].find({"comments.0": {"$exists": True}}, {"_id": 0, "id": 1})
+        async for idea in cursor:
+            try:
+                await drain_embedded_comments(collection_name, idea["id"])
+                drained += 1
+            except Exception:
+                logger.exception("Failed to migrate comments for %s %s", collection_name, idea["id"])
+        if drained:
+            logger.info("Migrated embedded comments of %d %s", drained, collection_name)
+
+async def attach_first_comment_page(collection_name: str, idea: Dict[str, Any]):
+    """Replace an idea document's comments with the first page from idea_comments"""
+    if idea.get("comments"):
+        comment_count = await drain_embedded_comments(collection_name, idea["id"])
+        if comment_count is not None:
+            idea["comment_count"] = comment_count
+    idea["comments"], idea["next_comment_cursor"] = await get_comment_page(idea["id"])
+
 # Authentication Routes
 @api_router.post("/auth/register", response_model=Token)
 async def register_user(user_data: UserCreate):
@@ -268,7 +2390,7 @@ async def register_user(user_data: UserCreate):
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await password_hasher.hash(user_data.password)
     user = User(
         email=user_data.email,
         full_name=user_data.full_name,
@@ -280,13 +2402,14 @@ async def register_user(user_data: UserCreate):
     user_dict = user.dict()
     user_dict["hashed_password"] = hashed_password
     
-    await db.users.insert_one(user_dict)
+    try:
+        await db.users.insert_one(user_dict)
+    except DuplicateKeyError:
+        # A concurrent registration with the same email got in first
+        raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create access token
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.id}, expires_delta=access_token_expires
-    )
+    access_token = issue_access_token(user)
     
     return Token(
         access_token=access_token,
@@ -302,16 +2425,18 @@ async def login_user(user_credentials: UserLogin):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     # Verify password
-    if not verify_password(user_credentials.password, user_doc.get("hashed_password", "")):
+    hashed_password = user_doc.get("hashed_password", "")
+    if not await password_hasher.verify(user_credentials.password, hashed_password):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    # Create access token
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user_doc["id"]}, expires_delta=access_token_expires
-    )
+    # Transparently upgrade hashes made with a different bcrypt cost
+    if password_needs_rehash(hashed_password):
+        start_background_task(rehash_password(user_doc["id"], user_credentials.password))
     
+    # Create access token
     user = User(**user_doc)
+    access_token = issue_access_token(user)
+    
     return Token(
         access_token=access_token,
         token_type="bearer",
@@ -325,21 +2450,37 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
 @api_router.put("/auth/profile", response_model=UserResponse)
 async def update_user_profile(
     profile_data: dict,
+    response: Response,
     current_user: User = Depends(get_current_user)
 ):
     # Update allowed fields
     allowed_fields = ["full_name", "skills", "interests", "experience_level"]
     update_data = {k: v for k, v in profile_data.items() if k in allowed_fields}
     
-    if update_data:
-        await db.users.update_one(
-            {"id": current_user.id},
-            {"$set": update_data}
-        )
+    if not update_data:
+        return UserResponse(**current_user.dict())
     
-    # Get updated user
-    updated_user = await db.users.find_one({"id": current_user.id})
-    return UserResponse(**User(**updated_user).dict())
+    update: Dict[str, Any] = {"$set": update_data}
+    if any(field in update_data for field in PROFILE_CLAIM_FIELDS):
+        # Issued claims tokens now carry a stale snapshot, they stay valid
+        # but get_token_user reads the user for them until they are replaced
+        update["$inc"] = {"profile_version": 1}
+    user_doc = await db.users.find_one_and_update(
+        {"id": current_user.id}, update, return_document=ReturnDocument.AFTER
+    )
+    user_cache.invalidate(current_user.id)
+    cache_token_versions(current_user.id, user_doc)
+    updated_user = User(**user_doc)
+    if CLAIMS_TOKENS_ENABLED and "$inc" in update:
+        response.headers["X-Access-Token"] = issue_access_token(updated_user)
+    
+    return UserResponse(**updated_user.dict())
+
+@api_router.post("/auth/logout-all")
+async def logout_all_sessions(current_user: User = Depends(get_current_user)):
+    """Revoke every token issued to the current user"""
+    await revoke_user_tokens(current_user.id)
+    return {"message": "Signed out of all sessions"}
 
 # Idea Routes
 @api_router.post("/ideas/{idea_id}/vote")
@@ -348,16 +2489,6 @@ async def vote_on_idea(
     vote_data: VoteCreate,
     current_user: User = Depends(get_current_user)
 ):
-    # Validate scores
-    for score in [vote_data.feasibility_score, vote_data.market_potential_score, vote_data.interest_score]:
-        if score < 1 or score > 5:
-            raise HTTPException(status_code=400, detail="Scores must be between 1 and 5")
-    
-    # Check if idea exists
-    idea = await db.ideas.find_one({"id": idea_id})
-    if not idea:
-        raise HTTPException(status_code=404, detail="Idea not found")
-    
     # Create vote object
     vote = IdeaVote(
         user_id=current_user.id,
@@ -367,47 +2498,75 @@ async def vote_on_idea(
         interest_score=vote_data.interest_score
     )
     
-    # Remove existing vote from this user if exists
-    await db.ideas.update_one(
-        {"id": idea_id},
-        {"$pull": {"votes": {"user_id": current_user.id}}}
-    )
+    if VOTE_BUFFER_ENABLED:
+        # Buffered mode only checks the idea here, the write happens on the next flush
+        idea = await db.ideas.find_one({"id": idea_id}, VOTE_TARGET_PROJECTION)
+        if not idea:
+            raise HTTPException(status_code=404, detail="Idea not found")
+        if not idea.get("votes"):
+            vote_buffer.add(idea_id, vote)
+            reputation_ledger.append(current_user.id, vote_reputation_reason(vote.vote_type), idea_id)
+            return {"message": "Vote recorded successfully", "scores": None, "queued": True}
     
-    # Add new vote
-    await db.ideas.update_one(
-        {"id": idea_id},
-        {"$push": {"votes": vote.dict()}}
-    )
+    # Replace any existing vote from this user and update the idea scores
+    scores = await cast_vote("ideas", idea_id, vote)
     
     # Update user reputation
-    reputation_change = 2 if vote_data.vote_type == "upvote" else 1
-    await db.users.update_one(
-        {"id": current_user.id},
-        {"$inc": {"reputation_score": reputation_change}}
-    )
+    reputation_ledger.append(current_user.id, vote_reputation_reason(vote.vote_type), idea_id)
+    
+    return {"message": "Vote recorded successfully", "scores": scores}
+
+@api_router.delete("/ideas/{idea_id}/vote")
+async def withdraw_vote_on_idea(idea_id: str, current_user: User = Depends(get_current_user)):
+    """Withdraw the current user's vote on an idea"""
+    
+    idea = await db.ideas.find_one({"id": idea_id}, VOTE_TARGET_PROJECTION)
+    if not idea:
+        raise HTTPException(status_code=404, detail="Idea not found")
     
-    # Recalculate idea scores
-    updated_idea = await db.ideas.find_one({"id": idea_id})
-    scores = calculate_idea_scores([IdeaVote(**v) for v in updated_idea.get("votes", [])])
+    # Ideas with embedded votes only have the legacy scores, their counters
+    # are recounted from idea_votes once the votes are drained
+    drained = bool(idea.get("votes"))
+    if drained:
+        await drain_embedded_votes("ideas", idea_id)
     
-    await db.ideas.update_one(
-        {"id": idea_id},
-        {"$set": scores}
+    # A buffered vote would be written back by the next flush
+    discarded, uncounted, counted_vote = False, False, None
+    if VOTE_BUFFER_ENABLED:
+        discarded, uncounted, counted_vote = await vote_buffer.discard(idea_id, current_user.id)
+    
+    existing_vote = await db.idea_votes.find_one_and_delete(
+        {"idea_id": idea_id, "user_id": encode_user_id(current_user.id)},
+        projection={"_id": 0}
     )
+    if existing_vote:
+        existing_vote = decode_vote(existing_vote)
+    if uncounted:
+        # The stored vote may come from a failed flush that never counted
+        # it, the counters and stats still hold counted_vote
+        existing_vote = counted_vote
+    recount = drained or uncounted
+    if not existing_vote:
+        if recount:
+            await rebuild_idea_scores("ideas", idea_id)
+        if discarded:
+            return {"message": "Vote withdrawn successfully", "scores": None}
+        raise HTTPException(status_code=404, detail="Vote not found")
+    
+    if recount:
+        scores = await rebuild_idea_scores("ideas", idea_id)
+    else:
+        scores = await apply_vote_delta(db.ideas, {"id": idea_id}, vote_counter_delta(existing_vote, None))
+    user_stats_recorder.record_vote("ideas", idea_id, current_user.id, existing_vote, None)
     
-    return {"message": "Vote recorded successfully", "scores": scores}
+    return {"message": "Vote withdrawn successfully", "scores": scores}
 
 @api_router.post("/ideas/{idea_id}/comment")
 async def comment_on_idea(
     idea_id: str,
     comment_data: CommentCreate,
-    current_user: User = Depends(get_current_user)
+    current_user: TokenUser = Depends(get_token_user)
 ):
-    # Check if idea exists
-    idea = await db.ideas.find_one({"id": idea_id})
-    if not idea:
-        raise HTTPException(status_code=404, detail="Idea not found")
-    
     # Create comment
     comment = IdeaComment(
         user_id=current_user.id,
@@ -419,42 +2578,56 @@ async def comment_on_idea(
         raise HTTPException(status_code=400, detail="Comment must be at least 10 characters long")
     
     # Add comment to idea
-    await db.ideas.update_one(
-        {"id": idea_id},
-        {"$push": {"comments": comment.dict()}}
-    )
+    if not await add_comment("ideas", {"id": idea_id}, comment):
+        raise HTTPException(status_code=404, detail="Idea not found")
     
-    # Update user reputation
-    await db.users.update_one(
-        {"id": current_user.id},
-        {"$inc": {"reputation_score": 1}}
-    )
+    # Update user reputation and stats
+    reputation_ledger.append(current_user.id, "comment", idea_id)
+    user_stats_recorder.record_comment("ideas", idea_id, comment)
     
     return {"message": "Comment added successfully", "comment": comment.dict()}
 
-@api_router.get("/ideas", response_model=List[EnhancedIdea])
+# response_model=None: the item model depends on ?view, and the returned
+# models are already validated (or skipped with FAST_RESPONSES_ENABLED).
+# The next page cursor is sent in the X-Next-Cursor header so the body
+# stays a plain list. Served from feed_cache when FEED_CACHE_ENABLED.
+@api_router.get("/ideas", response_model=None)
 async def get_all_ideas(
+    request: Request,
+    response: Response,
     category: Optional[str] = None,
-    sort_by: str = "validation_score",  # validation_score, created_at, total_votes
-    limit: int = 20,
-    skip: int = 0
-):
+    sort_by: str = "validation_score",  # validation_score, created_at, total_votes, hot, wilson
+    limit: int = Query(FEED_PAGE_SIZE, ge=1, le=MAX_FEED_PAGE_SIZE),
+    skip: int = Query(0, deprecated=True),  # use cursor instead
+    cursor: Optional[str] = None,
+    view: str = "summary"  # summary, full
+) -> Union[List[IdeaSummary], List[EnhancedIdea]]:
     query = {}
     if category and category != "All":
         query["category"] = category
     
     # Sort options
-    sort_field = "validation_score"
-    sort_order = -1  # Descending
+    sort_field = FEED_SORT_FIELDS.get(sort_by, "validation_score")
+    
+    model = EnhancedIdea if view == "full" else IdeaSummary
+    projection = IDEA_PROJECTION if view == "full" else IDEA_SUMMARY_PROJECTION
     
-    if sort_by == "created_at":
-        sort_field = "created_at" 
-    elif sort_by == "total_votes":
-        sort_field = "total_votes"
+    if FEED_CACHE_ENABLED:
+        async def load_page():
+            ideas, next_cursor = await find_feed_page(db.ideas, query, sort_field, limit, skip, cursor, projection)
+            return {"variants": precompress(feed_body(ideas, model)), "next_cursor": next_cursor}
+        
+        feed_category = query.get("category", ALL_CATEGORIES)
+        key = (feed_category, sort_field, 0 if cursor else skip, cursor, limit, model.__name__)
+        page = await feed_cache.get(key, feed_category, load_page)
+        headers = {"X-Next-Cursor": page["next_cursor"]} if page["next_cursor"] else None
+        return precompressed_response(request, page["variants"], headers)
     
-    ideas = await db.ideas.find(query).sort(sort_field, sort_order).skip(skip).limit(limit).to_list(limit)
+    ideas, next_cursor = await find_feed_page(db.ideas, query, sort_field, limit, skip, cursor, projection)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
-    return [EnhancedIdea(**idea) for idea in ideas]
+    return model_response(ideas, model, response)
 
 @api_router.get("/ideas/{idea_id}", response_model=EnhancedIdea)
 async def get_idea_details(idea_id: str):
@@ -462,71 +2635,104 @@ async def get_idea_details(idea_id: str):
     if not idea:
         raise HTTPException(status_code=404, detail="Idea not found")
     
-    return EnhancedIdea(**idea)
+    await attach_first_comment_page("ideas", idea)
+    return model_response(idea, EnhancedIdea)
+
+@api_router.get("/ideas/{idea_id}/comments", response_model=CommentPage)
+async def get_idea_comments(idea_id: str, after: Optional[str] = None, limit: int = COMMENT_PAGE_SIZE):
+    """Page through an idea's comments, oldest first, using the next_cursor of the previous page"""
+    limit = max(1, min(limit, MAX_COMMENT_PAGE_SIZE))
+    comments, next_cursor = await get_comment_page(idea_id, after, limit)
+    return CommentPage(comments=comments, next_cursor=next_cursor)
 
 # User Dashboard & Analytics Endpoints
+query_group_stats = {"queries": 0, "timeouts": 0, "failures": 0}
+
+class QueryGroup:
+    """Runs the independent queries of one request concurrently.
+    
+    Each query gets its own timeout. A query that times out or fails yields
+    its fallback value and is listed in `degraded`, so the response can
+    still be served with partial results. HTTPExceptions and failures of
+    required queries propagate.
+    """
+    
+    def __init__(self, timeout: float = QUERY_TIMEOUT):
+        self.timeout = timeout
+        self.queries: Dict[str, Tuple[Any, Any, float, bool]] = {}
+        self.degraded: List[str] = []
+    
+    def add(self, name: str, awaitable, fallback: Any = None, timeout: Optional[float] = None, required: bool = False):
+        self.queries[name] = (awaitable, fallback, timeout or self.timeout, required)
+    
+    async def _run_one(self, name: str) -> Any:
+        awaitable, fallback, timeout, required = self.queries[name]
+        query_group_stats["queries"] += 1
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except HTTPException:
+            raise
+        except asyncio.TimeoutError:
+            query_group_stats["timeouts"] += 1
+            if required:
+                raise HTTPException(status_code=503, detail="Request timed out, please try again")
+            logger.warning("Query %s timed out after %.1fs", name, timeout)
+        except Exception:
+            query_group_stats["failures"] += 1
+            if required:
+                raise
+            logger.exception("Query %s failed", name)
+        self.degraded.append(name)
+        return fallback
+    
+    async def run(self) -> Dict[str, Any]:
+        names = list(self.queries)
+        results = await asyncio.gather(*(self._run_one(name) for name in names))
+        return dict(zip(names, results))
+
+async def get_reputation_score(user_id: str) -> int:
+    """Reputation moves too often for the token snapshot, read it on its own"""
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user.reputation_score
+    user_doc = await db.users.find_one({"id": user_id}, {"_id": 0, "reputation_score": 1})
+    return user_doc.get("reputation_score", 0) if user_doc else 0
+
 @api_router.get("/user/dashboard")
-async def get_user_dashboard(current_user: User = Depends(get_current_user)):
+async def get_user_dashboard(current_user: TokenUser = Depends(get_token_user)):
     """Get comprehensive user dashboard data"""
     user_id = current_user.id
     
-    # Get user's voting activity
-    user_votes = await db.ideas.find({"votes.user_id": user_id}).to_list(1000)
-    total_votes = sum(len([vote for vote in idea["votes"] if vote["user_id"] == user_id]) for idea in user_votes)
-    
-    # Get user's comments
-    user_comments = await db.ideas.find({"comments.user_id": user_id}).to_list(1000)
-    total_comments = sum(len([comment for comment in idea["comments"] if comment["user_id"] == user_id]) for idea in user_comments)
-    
-    # Get user's submitted ideas
-    user_submitted_ideas = await db.submitted_ideas.find({"submitter_id": user_id}).to_list(1000)
-    total_submitted_ideas = len(user_submitted_ideas)
-    
-    # Get ideas the user has voted on recently
-    recent_voted_ideas = []
-    for idea in user_votes[-5:]:  # Last 5 ideas voted on
-        user_vote = next((vote for vote in idea["votes"] if vote["user_id"] == user_id), None)
-        if user_vote:
-            recent_voted_ideas.append({
-                "idea_id": idea["id"],
-                "idea_title": idea["title"],
-                "vote_type": user_vote["vote_type"],
-                "voted_at": user_vote["created_at"]
-            })
-    
-    # Get user's commented ideas
-    recent_commented_ideas = []
-    for idea in user_comments[-5:]:  # Last 5 ideas commented on
-        user_comment = next((comment for comment in idea["comments"] if comment["user_id"] == user_id), None)
-        if user_comment:
-            recent_commented_ideas.append({
-                "idea_id": idea["id"],
-                "idea_title": idea["title"],
-                "comment_preview": user_comment["content"][:100] + "..." if len(user_comment["content"]) > 100 else user_comment["content"],
-                "commented_at": user_comment["created_at"]
-            })
-    
-    # Get user's recent submitted ideas
-    recent_submitted_ideas = []
-    for idea in user_submitted_ideas[-5:]:  # Last 5 submitted ideas
-        recent_submitted_ideas.append({
-            "idea_id": idea["id"],
-            "idea_title": idea["title"],
-            "status": idea["status"],
-            "submitted_at": idea["created_at"]
-        })
-    
-    # Calculate engagement metrics
-    upvotes_given = sum(len([vote for vote in idea["votes"] if vote["user_id"] == user_id and vote["vote_type"] == "upvote"]) for idea in user_votes)
-    downvotes_given = sum(len([vote for vote in idea["votes"] if vote["user_id"] == user_id and vote["vote_type"] == "downvote"]) for idea in user_votes)
-    
-    # Get user's favorite categories (based on voting patterns)
-    category_votes = {}
-    for idea in user_votes:
-        category = idea.get("category", "Other")
-        category_votes[category] = category_votes.get(category, 0) + 1
-    
-    favorite_categories = sorted(category_votes.items(), key=lambda x: x[1], reverse=True)[:3]
+    queries = QueryGroup()
+    queries.add("stats", db.user_stats.find_one({"user_id": user_id}, {"_id": 0, "flush_ids": 0}))
+    queries.add("reputation_score", get_reputation_score(user_id), fallback=0)
+    queries.add("activity_days", db.user_activity_days.find_one({"user_id": user_id}, {"_id": 0, "words": 1}))
+    results = await queries.run()
+    
+    stats = results["stats"]
+    activity_days = results["activity_days"]
+    if "stats" not in queries.degraded and not user_stats_built(stats):
+        stats = await backfill_user_stats(user_id)
+        activity_days = await db.user_activity_days.find_one({"user_id": user_id}, {"_id": 0, "words": 1})
+    stats = stats or {}
+    
+    total_votes = stats.get("total_votes", 0)
+    upvotes_given = stats.get("upvotes", 0)
+    downvotes_given = stats.get("downvotes", 0)
+    total_comments = stats.get("total_comments", 0)
+    total_submitted_ideas = stats.get("total_submitted_ideas", 0)
+    
+    favorite_categories = sorted(
+        ((category, count) for category, count in stats.get("category_votes", {}).items() if count > 0),
+        key=lambda x: x[1],
+        reverse=True
+    )[:3]
+    
+    # The recent lists keep a few spare entries, and comment ids are only used to maintain them
+    recent_comments = [
+        {key: value for key, value in comment.items() if key != "comment_id"}
+        for comment in stats.get("recent_comments", [])[:RECENT_ACTIVITY_LIMIT]
+    ]
     
     return {
         "user_stats": {
@@ -535,20 +2741,21 @@ async def get_user_dashboard(current_user: User = Depends(get_current_user)):
             "total_submitted_ideas": total_submitted_ideas,
             "upvotes_given": upvotes_given,
             "downvotes_given": downvotes_given,
-            "reputation_score": current_user.reputation_score,
+            "reputation_score": results["reputation_score"],
             "member_since": current_user.created_at,
             "favorite_categories": [{"category": cat, "count": count} for cat, count in favorite_categories]
         },
         "recent_activity": {
-            "voted_ideas": recent_voted_ideas,
-            "commented_ideas": recent_commented_ideas,
-            "submitted_ideas": recent_submitted_ideas
+            "voted_ideas": stats.get("recent_votes", [])[:RECENT_ACTIVITY_LIMIT],
+            "commented_ideas": recent_comments,
+            "submitted_ideas": stats.get("recent_submissions", [])[:RECENT_ACTIVITY_LIMIT]
         },
         "engagement_summary": {
             "total_interactions": total_votes + total_comments + total_submitted_ideas,
             "vote_ratio": round(upvotes_given / (upvotes_given + downvotes_given) * 100, 1) if (upvotes_given + downvotes_given) > 0 else 0,
-            "active_days": 0  # TODO: Calculate based on activity dates
-        }
+            **activity_summary((activity_days or {}).get("words", {}), datetime.utcnow())
+        },
+        "degraded": queries.degraded
     }
 
 # Idea Submission Endpoints
@@ -573,13 +2780,11 @@ async def submit_idea(idea_data: IdeaSubmission, current_user: User = Depends(ge
     )
     
     # Save to database
-    await db.submitted_ideas.insert_one(submitted_idea.dict())
+    await db.submitted_ideas.insert_one({**submitted_idea.dict(), **NEW_IDEA_RANKING})
     
-    # Update user reputation for idea submission
-    await db.users.update_one(
-        {"id": current_user.id},
-        {"$inc": {"reputation_score": 5}}  # +5 points for submitting an idea
-    )
+    # Update user reputation and stats for idea submission
+    reputation_ledger.append(current_user.id, "idea_submission", submitted_idea.id)
+    user_stats_recorder.record_submission(submitted_idea.dict())
     
     return submitted_idea
 
@@ -604,6 +2809,7 @@ async def get_submitted_idea_details(idea_id: str, current_user: User = Depends(
         if idea["status"] != IdeaStatus.APPROVED:
             raise HTTPException(status_code=403, detail="Access denied")
     
+    await attach_first_comment_page("submitted_ideas", idea)
     return SubmittedIdea(**idea)
 
 @api_router.put("/ideas/submitted/{idea_id}", response_model=SubmittedIdea)
@@ -633,6 +2839,7 @@ async def update_submitted_idea(idea_id: str, idea_data: IdeaSubmission, current
     
     # Get updated idea
     updated_idea = await db.submitted_ideas.find_one({"id": idea_id})
+    user_stats_recorder.record_submission(updated_idea, "updated")
     return SubmittedIdea(**updated_idea)
 
 @api_router.delete("/ideas/submitted/{idea_id}")
@@ -653,16 +2860,20 @@ async def delete_submitted_idea(idea_id: str, current_user: User = Depends(get_c
     
     # Delete the idea
     await db.submitted_ideas.delete_one({"id": idea_id})
+    user_stats_recorder.record_submission(idea, "deleted")
     
     return {"message": "Idea deleted successfully"}
 
-@api_router.get("/ideas/community", response_model=List[SubmittedIdea])
+@api_router.get("/ideas/community", response_model=None)
 async def get_community_ideas(
+    response: Response,
     category: Optional[str] = None,
     sort_by: Optional[str] = "created_at",
-    skip: int = 0,
-    limit: int = 20
-):
+    skip: int = Query(0, deprecated=True),  # use cursor instead
+    limit: int = Query(FEED_PAGE_SIZE, ge=1, le=MAX_FEED_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    view: str = "summary"  # summary, full
+) -> Union[List[SubmittedIdeaSummary], List[SubmittedIdea]]:
     """Get approved community-submitted ideas"""
     
     # Build query for approved ideas only
@@ -672,37 +2883,19 @@ async def get_community_ideas(
         query["category"] = category
     
     # Sort options
-    sort_field = "created_at"
-    sort_order = -1  # Descending
-    
-    if sort_by == "validation_score":
-        sort_field = "validation_score"
-    elif sort_by == "total_votes":
-        sort_field = "total_votes"
+    sort_field = FEED_SORT_FIELDS.get(sort_by, "created_at")
     
-    ideas = await db.submitted_ideas.find(query).sort(sort_field, sort_order).skip(skip).limit(limit).to_list(limit)
+    projection = SUBMITTED_IDEA_PROJECTION if view == "full" else SUBMITTED_IDEA_SUMMARY_PROJECTION
+    ideas, next_cursor = await find_feed_page(db.submitted_ideas, query, sort_field, limit, skip, cursor, projection)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
-    return [SubmittedIdea(**idea) for idea in ideas]
+    return model_response(ideas, SubmittedIdea if view == "full" else SubmittedIdeaSummary, response)
 
 @api_router.post("/ideas/submitted/{idea_id}/vote")
 async def vote_on_submitted_idea(idea_id: str, vote_data: VoteCreate, current_user: User = Depends(get_current_user)):
     """Vote on a submitted idea (only if approved)"""
     
-    idea = await db.submitted_ideas.find_one({"id": idea_id})
-    if not idea:
-        raise HTTPException(status_code=404, detail="Idea not found")
-    
-    # Only allow voting on approved ideas
-    if idea["status"] != IdeaStatus.APPROVED:
-        raise HTTPException(status_code=400, detail="Can only vote on approved ideas")
-    
-    # Check if user already voted
-    existing_vote = None
-    for vote in idea["votes"]:
-        if vote["user_id"] == current_user.id:
-            existing_vote = vote
-            break
-    
     # Create new vote
     new_vote = IdeaVote(
         user_id=current_user.id,
@@ -712,50 +2905,18 @@ async def vote_on_submitted_idea(idea_id: str, vote_data: VoteCreate, current_us
         interest_score=vote_data.interest_score
     )
     
-    if existing_vote:
-        # Update existing vote
-        await db.submitted_ideas.update_one(
-            {"id": idea_id, "votes.user_id": current_user.id},
-            {"$set": {"votes.$": new_vote.dict()}}
-        )
-    else:
-        # Add new vote
-        await db.submitted_ideas.update_one(
-            {"id": idea_id},
-            {"$push": {"votes": new_vote.dict()}}
-        )
-    
-    # Recalculate scores
-    updated_idea = await db.submitted_ideas.find_one({"id": idea_id})
-    votes = [IdeaVote(**vote) for vote in updated_idea["votes"]]
-    scores = calculate_idea_scores(votes)
-    
-    await db.submitted_ideas.update_one(
-        {"id": idea_id},
-        {"$set": scores}
-    )
+    # Replace any existing vote and update the scores, only approved ideas accept votes
+    await cast_vote("submitted_ideas", idea_id, new_vote, required_status=IdeaStatus.APPROVED)
     
     # Update user reputation
-    reputation_change = 2 if vote_data.vote_type == "upvote" else 1
-    await db.users.update_one(
-        {"id": current_user.id},
-        {"$inc": {"reputation_score": reputation_change}}
-    )
+    reputation_ledger.append(current_user.id, vote_reputation_reason(new_vote.vote_type), idea_id)
     
     return {"message": "Vote recorded successfully"}
 
 @api_router.post("/ideas/submitted/{idea_id}/comment")
-async def comment_on_submitted_idea(idea_id: str, comment_data: CommentCreate, current_user: User = Depends(get_current_user)):
+async def comment_on_submitted_idea(idea_id: str, comment_data: CommentCreate, current_user: TokenUser = Depends(get_token_user)):
     """Comment on a submitted idea (only if approved)"""
     
-    idea = await db.submitted_ideas.find_one({"id": idea_id})
-    if not idea:
-        raise HTTPException(status_code=404, detail="Idea not found")
-    
-    # Only allow commenting on approved ideas
-    if idea["status"] != IdeaStatus.APPROVED:
-        raise HTTPException(status_code=400, detail="Can only comment on approved ideas")
-    
     # Validate comment content
     if len(comment_data.content.strip()) < 10:
         raise HTTPException(status_code=400, detail="Comment must be at least 10 characters long")
@@ -767,82 +2928,87 @@ async def comment_on_submitted_idea(idea_id: str, comment_data: CommentCreate, c
         content=comment_data.content.strip()
     )
     
-    # Add comment to idea
-    await db.submitted_ideas.update_one(
-        {"id": idea_id},
-        {"$push": {"comments": new_comment.dict()}}
-    )
+    # Add comment to idea, only approved ideas accept comments
+    if not await add_comment("submitted_ideas", {"id": idea_id, "status": IdeaStatus.APPROVED}, new_comment):
+        idea = await db.submitted_ideas.find_one({"id": idea_id}, {"_id": 1})
+        if not idea:
+            raise HTTPException(status_code=404, detail="Idea not found")
+        raise HTTPException(status_code=400, detail="Can only comment on approved ideas")
     
     # Update user reputation
-    await db.users.update_one(
-        {"id": current_user.id},
-        {"$inc": {"reputation_score": 1}}
-    )
+    reputation_ledger.append(current_user.id, "comment", idea_id)
     
     return {"message": "Comment added successfully"}
 
+def rollup_period(value: str, granularity: str, end: bool = False) -> str:
+    """Turn a ?from= or ?to= date into the rollup period it falls in"""
+    try:
+        date = datetime.strptime(value, ROLLUP_GRANULARITIES["day"] if len(value) > 7 else ROLLUP_GRANULARITIES["month"])
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM or YYYY-MM-DD")
+    if end and len(value) <= 7:
+        # ?to=YYYY-MM includes the whole month
+        date = (date.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return date.strftime(ROLLUP_GRANULARITIES[granularity])
+
 @api_router.get("/user/analytics")
-async def get_user_analytics(current_user: User = Depends(get_current_user)):
+async def get_user_analytics(
+    current_user: TokenUser = Depends(get_token_user),
+    from_: Optional[str] = Query(None, alias="from"),  # YYYY-MM or YYYY-MM-DD
+    to: Optional[str] = None,
+    granularity: str = "month"  # month, day
+):
     """Get user analytics data for charts and graphs"""
     user_id = current_user.id
-    
-    # Get all ideas the user has interacted with
-    user_ideas = await db.ideas.find({
-        "$or": [
-            {"votes.user_id": user_id},
-            {"comments.user_id": user_id}
-        ]
-    }).to_list(1000)
+    if granularity not in ROLLUP_GRANULARITIES:
+        raise HTTPException(status_code=400, detail="granularity must be month or day")
+    
+    query: Dict[str, Any] = {"user_id": user_id, "granularity": granularity}
+    period_range = {}
+    if from_:
+        period_range["$gte"] = rollup_period(from_, granularity)
+    if to:
+        period_range["$lte"] = rollup_period(to, granularity, end=True)
+    if period_range:
+        query["period"] = period_range
+    
+    queries = QueryGroup()
+    queries.add("stats", db.user_stats.find_one({"user_id": user_id}, {"_id": 0, "rebuilt_at": 1}))
+    queries.add("rollups", db.user_activity_rollups.find(query, {"_id": 0}).sort("period", 1).to_list(None), fallback=[])
+    results = await queries.run()
+    
+    rollups = results["rollups"]
+    if "stats" not in queries.degraded and not user_stats_built(results["stats"]):
+        # The rollups of this user have not been backfilled yet
+        await backfill_user_stats(user_id)
+        rollups = await db.user_activity_rollups.find(query, {"_id": 0}).sort("period", 1).to_list(None)
     
     # Prepare data for charts
-    monthly_activity = {}
-    category_distribution = {}
-    score_distribution = {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0}
-    
-    for idea in user_ideas:
-        # Process votes
-        user_votes = [vote for vote in idea["votes"] if vote["user_id"] == user_id]
-        for vote in user_votes:
-            vote_date = vote["created_at"]
-            month_key = f"{vote_date.year}-{vote_date.month:02d}"
-            
-            if month_key not in monthly_activity:
-                monthly_activity[month_key] = {"votes": 0, "comments": 0}
-            monthly_activity[month_key]["votes"] += 1
-            
-            # Track category distribution
-            category = idea.get("category", "Other")
-            category_distribution[category] = category_distribution.get(category, 0) + 1
-            
-            # Track score distribution
-            avg_score = round((vote["feasibility_score"] + vote["market_potential_score"] + vote["interest_score"]) / 3)
-            score_distribution[str(avg_score)] += 1
-        
-        # Process comments
-        user_comments = [comment for comment in idea["comments"] if comment["user_id"] == user_id]
-        for comment in user_comments:
-            comment_date = comment["created_at"]
-            month_key = f"{comment_date.year}-{comment_date.month:02d}"
-            
-            if month_key not in monthly_activity:
-                monthly_activity[month_key] = {"votes": 0, "comments": 0}
-            monthly_activity[month_key]["comments"] += 1
-    
-    # Convert to chart-friendly format
     activity_timeline = []
-    for month, activity in sorted(monthly_activity.items()):
+    category_distribution = {}
+    score_distribution = {score: 0 for score in SCORE_BUCKETS}
+    for rollup in rollups:
+        votes = rollup.get("votes", 0)
+        comments = rollup.get("comments", 0)
+        if votes == 0 and comments == 0:
+            continue
         activity_timeline.append({
-            "month": month,
-            "votes": activity["votes"],
-            "comments": activity["comments"],
-            "total": activity["votes"] + activity["comments"]
+            granularity: rollup["period"],
+            "votes": votes,
+            "comments": comments,
+            "total": votes + comments
         })
+        for category, count in rollup.get("category_votes", {}).items():
+            category_distribution[category] = category_distribution.get(category, 0) + count
+        for score, count in rollup.get("score_votes", {}).items():
+            score_distribution[score] = score_distribution.get(score, 0) + count
     
     return {
         "activity_timeline": activity_timeline,
-        "category_distribution": [{"category": cat, "count": count} for cat, count in category_distribution.items()],
+        "category_distribution": [{"category": cat, "count": count} for cat, count in category_distribution.items() if count > 0],
         "score_distribution": [{"score": score, "count": count} for score, count in score_distribution.items()],
-        "total_interactions": sum(activity["votes"] + activity["comments"] for activity in monthly_activity.values())
+        "total_interactions": sum(point["total"] for point in activity_timeline),
+        "degraded": queries.degraded
     }
 
 # Add your existing routes
@@ -850,6 +3016,22 @@ async def get_user_analytics(current_user: User = Depends(get_current_user)):
 async def root():
     return {"message": "Hello World"}
 
+@api_router.get("/metrics")
+async def get_metrics():
+    """In-process performance counters"""
+    return {
+        "vote_buffer": vote_buffer.metrics(),
+        "reputation_ledger": reputation_ledger.metrics(),
+        "user_cache": user_cache.metrics(),
+        "token_version_cache": token_version_cache.metrics(),
+        "password_hasher": password_hasher.metrics(),
+        "user_stats": user_stats_recorder.metrics(),
+        "query_groups": query_group_stats,
+        "mongo_pool": pool_monitor.metrics(),
+        "compression": compression_stats,
+        "feed_cache": feed_cache.metrics(),
+    }
+
 @api_router.post("/status", response_model=StatusCheck)
 async def create_status_check(input: StatusCheckCreate):
     status_dict = input.dict()
@@ -862,15 +3044,152 @@ async def get_status_checks():
     status_checks = await db.status_checks.find().to_list(1000)
     return [StatusCheck(**status_check) for status_check in status_checks]
 
+# Response compression
+# Encodings in order of preference when the client accepts several equally
+COMPRESSION_ENCODINGS = ["br", "gzip"] if brotli else ["gzip"]
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript")
+
+compression_stats = {
+    "responses": {encoding: 0 for encoding in COMPRESSION_ENCODINGS},
+    "bytes_in": 0,
+    "bytes_out": 0,
+    "below_min_size": 0,
+    "precompressed_served": 0,
+}
+
+def choose_encoding(accept_encoding: Optional[str]) -> str:
+    """The preferred supported encoding in an Accept-Encoding header, or identity"""
+    accepted: Dict[str, float] = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name.strip():
+            accepted[name.strip().lower()] = quality
+    
+    candidates = [
+        (accepted.get(encoding, accepted.get("*", 0.0)), -preference, encoding)
+        for preference, encoding in enumerate(COMPRESSION_ENCODINGS)
+    ]
+    quality, _, encoding = max(candidates)
+    return encoding if quality > 0 else "identity"
+
+def new_compressor(encoding: str):
+    """(compress, finish) functions of a streaming compressor"""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.finish
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    return compressor.compress, compressor.flush
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    compress, finish = new_compressor(encoding)
+    return compress(body) + finish()
+
+def precompress(body: bytes) -> Dict[str, bytes]:
+    """A response body in every supported encoding, for bodies cached and served many times"""
+    variants = {"identity": body}
+    if len(body) >= COMPRESSION_MIN_SIZE:
+        for encoding in COMPRESSION_ENCODINGS:
+            variants[encoding] = compress_body(body, encoding)
+    return variants
+
+def precompressed_response(request: Request, variants: Dict[str, bytes], headers: Optional[Dict[str, str]] = None,
+                           media_type: str = "application/json") -> Response:
+    """Serve the variant of a precompressed body the client accepts, CompressionMiddleware passes it through"""
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    if encoding not in variants:
+        encoding = "identity"
+    response = Response(variants[encoding], media_type=media_type, headers=headers)
+    if len(variants) > 1:
+        response.headers.add_vary_header("Accept-Encoding")
+    if encoding != "identity":
+        response.headers["Content-Encoding"] = encoding
+        compression_stats["precompressed_served"] += 1
+    return response
+
+class CompressionMiddleware:
+    """gzip or brotli compression negotiated with Accept-Encoding.
+    
+    Responses that are not text or JSON, already have a Content-Encoding,
+    or are sent in one piece smaller than minimum_size are passed through.
+    Streamed responses are compressed chunk by chunk.
+    """
+    
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding == "identity":
+            await self.app(scope, receive, send)
+            return
+        
+        start_message: Optional[dict] = None
+        compressor = None
+        
+        async def send_compressed(message):
+            nonlocal start_message, compressor
+            if message["type"] == "http.response.start":
+                # Hold the headers until the first body chunk shows the size
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                compressible = (
+                    "content-encoding" not in headers
+                    and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                )
+                if compressible and (more_body or len(body) >= self.minimum_size):
+                    compressor = new_compressor(encoding)
+                    headers["Content-Encoding"] = encoding
+                    headers.add_vary_header("Accept-Encoding")
+                    del headers["Content-Length"]
+                    compression_stats["responses"][encoding] += 1
+                elif compressible:
+                    compression_stats["below_min_size"] += 1
+                await send(start_message)
+                start_message = None
+            
+            if compressor is None:
+                await send(message)
+                return
+            compress, finish = compressor
+            chunk = compress(body) + (b"" if more_body else finish())
+            compression_stats["bytes_in"] += len(body)
+            compression_stats["bytes_out"] += len(chunk)
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+        
+        await self.app(scope, receive, send_compressed)
+
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(CompressionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Access-Token"],
 )
 
 # Configure logging
@@ -880,6 +3199,107 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Index registry, as (keys, options) per collection. Ensured at startup
+# (unless ENSURE_INDEXES_ON_STARTUP=false) and by manage_indexes.py, which
+# can also audit the live indexes against it.
+INDEXES = {
+    "users": [
+        ([("id", 1)], {"unique": True}),
+        ([("email", 1)], {"unique": True}),
+    ],
+    # One (field, id) index per feed sort, with and without the category filter
+    "ideas": [
+        ([("id", 1)], {"unique": True}),  # idea lookups, including the dashboard $lookup
+    ] + [
+        ([(field, -1), ("id", -1)], {}) for field in FEED_SORT_FIELDS.values()
+    ] + [
+        ([("category", 1), (field, -1), ("id", -1)], {}) for field in FEED_SORT_FIELDS.values()
+    ],
+    "submitted_ideas": [
+        ([("id", 1)], {"unique": True}),
+    ] + [
+        ([("status", 1), (field, -1), ("id", -1)], {}) for field in FEED_SORT_FIELDS.values()
+    ] + [
+        ([("status", 1), ("category", 1), (field, -1), ("id", -1)], {}) for field in FEED_SORT_FIELDS.values()
+    ] + [
+        ([("submitter_id", 1), ("created_at", -1)], {}),
+    ],
+    "idea_votes": [
+        ([("idea_id", 1), ("user_id", 1)], {"unique": True}),
+        ([("user_id", 1), ("created_at", -1)], {}),
+    ],
+    "idea_comments": [
+        ([("id", 1)], {"unique": True}),
+        ([("idea_id", 1), ("created_at", 1), ("id", 1)], {}),
+        ([("user_id", 1), ("created_at", -1)], {}),
+    ],
+    "user_stats": [
+        ([("user_id", 1)], {"unique": True}),
+    ],
+    "user_activity_rollups": [
+        ([("user_id", 1), ("granularity", 1), ("period", 1)], {"unique": True}),
+    ],
+    "user_activity_days": [
+        ([("user_id", 1)], {"unique": True}),
+    ],
+    "reputation_events": [
+        ([("id", 1)], {"unique": True}),
+        ([("applied", 1), ("created_at", 1)], {}),
+        ([("applied", 1), ("claimed_at", 1)], {"partialFilterExpression": {"applied": "claiming"}}),
+        ([("batch_id", 1)], {"sparse": True}),
+        ([("user_id", 1), ("created_at", -1)], {}),
+    ],
+}
+
+async def ensure_indexes() -> List[str]:
+    """Create the indexes in INDEXES that do not exist yet, returns the ones that failed"""
+    failed = []
+    for collection_name, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                await db[collection_name].create_index(keys, **options)
+            except OperationFailure as exc:
+                # Conflicting options or duplicate keys, keep serving and let the audit report it
+                logger.error("Could not create index %s on %s: %s", keys, collection_name, exc)
+                failed.append(f"{collection_name} {keys}")
+    return failed
+
+background_tasks = set()
+
+def start_background_task(coro):
+    """Keep a reference to fire-and-forget tasks so they are not garbage collected"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def warm_connection_pool():
+    """Open MONGO_MIN_POOL_SIZE connections before the first request needs them"""
+    try:
+        await asyncio.gather(*(db.command("ping") for _ in range(max(MONGO_MIN_POOL_SIZE, 1))))
+        logger.info("Connection pool warmed, %d connections open", pool_monitor.connections)
+    except Exception:
+        logger.exception("Could not warm the connection pool")
+
+@app.on_event("startup")
+async def startup_db_client():
+    await warm_connection_pool()
+    if ENSURE_INDEXES_ON_STARTUP:
+        await ensure_indexes()
+    start_background_task(drain_all_embedded_votes())
+    start_background_task(drain_all_embedded_comments())
+    start_background_task(refresh_rankings_periodically())
+    if VOTE_BUFFER_ENABLED:
+        vote_buffer.start()
+    reputation_ledger.start()
+    user_stats_recorder.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in list(background_tasks):
+        task.cancel()
+    await vote_buffer.drain()
+    await reputation_ledger.drain()
+    await user_stats_recorder.drain()
+    password_hasher.executor.shutdown(wait=False)
     client.close()
@@ -146,7 +146,9 @@ class AuthService {
       }
 
       const updatedUser = await response.json();
-      this.setAuthData(this.getToken(), updatedUser);
+      // Profile changes retire tokens carrying the old profile, use the fresh one
+      const token = response.headers.get('X-Access-Token') || this.getToken();
+      this.setAuthData(token, updatedUser);
       return updatedUser;
     } catch (error) {
       console.error('Profile update error:', error);
@@ -174,6 +174,25 @@ export const EnhancedIdeaCard = ({ idea, onVote, onComment, currentUser }) => {
   const [showVoteModal, setShowVoteModal] = useState(false);
   const [showCommentModal, setShowCommentModal] = useState(false);
   const [showImplementationGuide, setShowImplementationGuide] = useState(false);
+  // Feed summaries leave out the guide and comments, they are loaded on demand
+  const [details, setDetails] = useState(null);
+  const implementationGuide = idea.implementation_guide || (details && details.implementation_guide);
+  const comments = (idea.comments && idea.comments.length > 0) ? idea.comments : ((details && details.comments) || []);
+
+  const loadDetails = async () => {
+    if (!details) {
+      try {
+        setDetails(await authService.getIdeaDetails(idea.id));
+      } catch (error) {
+        console.error('Idea details error:', error);
+      }
+    }
+  };
+
+  const openImplementationGuide = async () => {
+    await loadDetails();
+    setShowImplementationGuide(true);
+  };
 
   const VoteModal = () => {
     const [voteData, setVoteData] = useState({
@@ -368,27 +387,27 @@ export const EnhancedIdeaCard = ({ idea, onVote, onComment, currentUser }) => {
           </button>
         </div>
 
-        {idea.implementation_guide ? (
+        {implementationGuide ? (
           <div className="space-y-6">
             <div className="grid md:grid-cols-3 gap-4">
               <div className="bg-blue-50 p-4 rounded-lg">
                 <h4 className="font-semibold text-blue-900 mb-2">Timeline</h4>
-                <p className="text-blue-700">{idea.implementation_guide.estimated_time}</p>
+                <p className="text-blue-700">{implementationGuide.estimated_time}</p>
               </div>
               <div className="bg-green-50 p-4 rounded-lg">
                 <h4 className="font-semibold text-green-900 mb-2">Budget</h4>
-                <p className="text-green-700">{idea.implementation_guide.estimated_budget}</p>
+                <p className="text-green-700">{implementationGuide.estimated_budget}</p>
               </div>
               <div className="bg-purple-50 p-4 rounded-lg">
                 <h4 className="font-semibold text-purple-900 mb-2">Difficulty</h4>
-                <p className="text-purple-700">{idea.implementation_guide.difficulty}</p>
+                <p className="text-purple-700">{implementationGuide.difficulty}</p>
               </div>
             </div>
 
             <div>
               <h4 className="font-semibold text-gray-900 mb-3">Required Skills</h4>
               <div className="flex flex-wrap gap-2">
-                {idea.implementation_guide.required_skills.map((skill, index) => (
+                {implementationGuide.required_skills.map((skill, index) => (
                   <span
                     key={index}
                     className="px-3 py-1 bg-gray-100 text-gray-800 rounded-full text-sm"
@@ -402,7 +421,7 @@ export const EnhancedIdeaCard = ({ idea, onVote, onComment, currentUser }) => {
             <div>
               <h4 className="font-semibold text-gray-900 mb-3">Step-by-Step Guide</h4>
               <ol className="space-y-3">
-                {idea.implementation_guide.steps.map((step, index) => (
+                {implementationGuide.steps.map((step, index) => (
                   <li key={index} className="flex items-start">
                     <span className="flex-shrink-0 w-6 h-6 bg-blue-500 text-white rounded-full flex items-center justify-center text-sm font-medium mr-3 mt-0.5">
                       {index + 1}
@@ -497,9 +516,9 @@ export const EnhancedIdeaCard = ({ idea, onVote, onComment, currentUser }) => {
             <span className="text-sm text-gray-500">Login to rate and comment</span>
           )}
           
-          {idea.implementation_guide && (
+          {(implementationGuide || idea.has_implementation_guide) && (
             <button
-              onClick={() => setShowImplementationGuide(true)}
+              onClick={openImplementationGuide}
               className="flex items-center px-3 py-1 bg-purple-100 text-purple-800 rounded-full text-sm hover:bg-purple-200 transition-colors"
             >
               🚀 Implementation Guide
@@ -508,11 +527,18 @@ export const EnhancedIdeaCard = ({ idea, onVote, onComment, currentUser }) => {
         </div>
 
         {/* Comments Preview */}
-        {idea.comments && idea.comments.length > 0 && (
+        {comments.length === 0 && idea.comment_count > 0 && (
+          <div className="mt-4 pt-4 border-t border-gray-200">
+            <button onClick={loadDetails} className="text-sm text-blue-600 hover:text-blue-800">
+              💬 Show {idea.comment_count} comments
+            </button>
+          </div>
+        )}
+        {comments.length > 0 && (
           <div className="mt-4 pt-4 border-t border-gray-200">
             <h4 className="font-medium text-gray-900 mb-2">Recent Comments</h4>
             <div className="space-y-2">
-              {idea.comments.slice(0, 2).map((comment, index) => (
+              {comments.slice(0, 2).map((comment, index) => (
                 <div key={index} className="bg-gray-50 p-3 rounded">
                   <div className="flex justify-between items-start mb-1">
                     <span className="font-medium text-sm text-gray-900">{comment.user_name}</span>
@@ -523,9 +549,9 @@ export const EnhancedIdeaCard = ({ idea, onVote, onComment, currentUser }) => {
                   <p className="text-sm text-gray-700">{comment.content}</p>
                 </div>
               ))}
-              {idea.comments.length > 2 && (
+              {idea.comment_count > 2 && (
                 <button className="text-sm text-blue-600 hover:text-blue-800">
-                  View all {idea.comments.length} comments
+                  View all {idea.comment_count} comments
                 </button>
               )}
             </div>
@@ -644,7 +670,7 @@ export const HomePage = () => {
       try {
         setLoading(true);
         // Try to get enhanced ideas first
-        const enhancedIdeas = await authService.getEnhancedIdeas({ limit: 1, sort_by: 'validation_score' });
+        const enhancedIdeas = await authService.getEnhancedIdeas({ limit: 1, sort_by: 'validation_score', view: 'full' });
         if (enhancedIdeas && enhancedIdeas.length > 0) {
           setTodayIdea(enhancedIdeas[0]);
         } else {
@@ -710,7 +736,7 @@ export const HomePage = () => {
   const refreshIdea = async () => {
     setLoading(true);
     try {
-      const enhancedIdeas = await authService.getEnhancedIdeas({ limit: 5, sort_by: 'created_at' });
+      const enhancedIdeas = await authService.getEnhancedIdeas({ limit: 5, sort_by: 'created_at', view: 'full' });
       if (enhancedIdeas && enhancedIdeas.length > 0) {
         // Get a random idea from the latest 5
         const randomIdea = enhancedIdeas[Math.floor(Math.random() * enhancedIdeas.length)];
@@ -0,0 +1,68 @@
+import os
+import sys
+from datetime import timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from server import (  # noqa: E402
+    ACTIVITY_EPOCH,
+    activity_day,
+    activity_day_masks,
+    activity_summary,
+    to_int64,
+)
+
+TODAY = ACTIVITY_EPOCH + timedelta(days=20000, hours=15)
+
+
+def stored_words(*days_ago, today=TODAY):
+    """The user_activity_days words of activity the given number of days before today"""
+    days = [activity_day(today) - ago for ago in days_ago]
+    return {word: to_int64(mask) for word, mask in activity_day_masks(days).items()}
+
+
+def test_empty_bitset():
+    assert activity_summary({}, TODAY) == {"active_days": 0, "current_streak": 0, "longest_streak": 0}
+
+
+def test_streak_ending_today():
+    assert activity_summary(stored_words(0, 1, 2), TODAY) == {
+        "active_days": 3, "current_streak": 3, "longest_streak": 3,
+    }
+
+
+def test_streak_ending_yesterday_is_still_current():
+    assert activity_summary(stored_words(1, 2, 3), TODAY) == {
+        "active_days": 3, "current_streak": 3, "longest_streak": 3,
+    }
+
+
+def test_streak_ending_before_yesterday_is_over():
+    assert activity_summary(stored_words(2, 3), TODAY)["current_streak"] == 0
+
+
+def test_gap_ends_the_current_streak():
+    summary = activity_summary(stored_words(0, 1, 3, 4, 5, 6, 7), TODAY)
+    assert summary == {"active_days": 7, "current_streak": 2, "longest_streak": 5}
+
+
+def test_days_in_several_words():
+    masks = activity_day_masks([0, 63, 64, 200])
+    assert masks == {"0": 1 | 1 << 63, "1": 1, "3": 1 << 8}
+
+
+@pytest.mark.parametrize("mask", [0, 1, (1 << 62) | 1, 1 << 63, (1 << 64) - 1])
+def test_to_int64_round_trip(mask):
+    value = to_int64(mask)
+    assert -(1 << 63) <= value < (1 << 63)
+    assert value & ((1 << 64) - 1) == mask
+
+
+def test_bit_63_counts_as_a_day():
+    # Day 63 is the sign bit of word 0, stored as a negative int64
+    today = ACTIVITY_EPOCH + timedelta(days=64)
+    words = {word: to_int64(mask) for word, mask in activity_day_masks([62, 63, 64]).items()}
+    assert words["0"] < 0
+    assert activity_summary(words, today) == {"active_days": 3, "current_streak": 3, "longest_streak": 3}
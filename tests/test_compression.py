@@ -0,0 +1,91 @@
+import gzip
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+import server  # noqa: E402
+from server import CompressionMiddleware, choose_encoding  # noqa: E402
+
+
+@pytest.fixture
+def both_encodings(monkeypatch):
+    monkeypatch.setattr(server, "COMPRESSION_ENCODINGS", ["br", "gzip"])
+
+
+@pytest.fixture
+def gzip_only(monkeypatch):
+    monkeypatch.setattr(server, "COMPRESSION_ENCODINGS", ["gzip"])
+
+
+@pytest.mark.parametrize("accept_encoding,expected", [
+    (None, "identity"),
+    ("", "identity"),
+    ("identity", "identity"),
+    ("gzip", "gzip"),
+    ("GZIP", "gzip"),
+    ("gzip, deflate, br", "br"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("br;q=0.5, gzip;q=0.8", "gzip"),
+    ("gzip;q=0", "identity"),
+    ("br;q=0, gzip;q=0", "identity"),
+    ("gzip;q=oops", "identity"),
+    ("*", "br"),
+    ("*, br;q=0", "gzip"),
+    ("*;q=0.1, gzip;q=0", "br"),
+    ("*;q=0", "identity"),
+])
+def test_choose_encoding(both_encodings, accept_encoding, expected):
+    assert choose_encoding(accept_encoding) == expected
+
+
+@pytest.mark.parametrize("accept_encoding,expected", [
+    ("br", "identity"),
+    ("br, gzip;q=0.5", "gzip"),
+    ("*", "gzip"),
+])
+def test_choose_encoding_without_brotli(gzip_only, accept_encoding, expected):
+    assert choose_encoding(accept_encoding) == expected
+
+
+@pytest.fixture
+def client(gzip_only):
+    pytest.importorskip("httpx")
+    from starlette.applications import Starlette
+    from starlette.responses import PlainTextResponse, Response
+    from starlette.routing import Route
+    from starlette.testclient import TestClient
+
+    app = Starlette(routes=[
+        Route("/small", lambda request: PlainTextResponse("x" * 99)),
+        Route("/large", lambda request: PlainTextResponse("x" * 100)),
+        Route("/binary", lambda request: Response(b"x" * 1000, media_type="image/png")),
+    ])
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+    return TestClient(app)
+
+
+def test_small_response_is_not_compressed(client):
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.text == "x" * 99
+
+
+def test_large_response_is_compressed(client):
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.text == "x" * 100
+
+
+def test_compressed_body_is_gzip(client):
+    with client.stream("GET", "/large", headers={"Accept-Encoding": "gzip"}) as response:
+        body = b"".join(response.iter_raw())
+    assert gzip.decompress(body) == b"x" * 100
+
+
+def test_identity_and_binary_responses_pass_through(client):
+    assert "content-encoding" not in client.get("/large", headers={"Accept-Encoding": "identity"}).headers
+    assert "content-encoding" not in client.get("/binary", headers={"Accept-Encoding": "gzip"}).headers
@@ -0,0 +1,129 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from server import ALL_CATEGORIES, FeedCache  # noqa: E402
+
+
+class FakeLoad:
+    """load() for FeedCache that counts its calls and can be held until released"""
+
+    def __init__(self, body: str = "page", held: bool = False):
+        self.body = body
+        self.calls = 0
+        self.release = asyncio.Event()
+        if not held:
+            self.release.set()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        return {"body": self.body}
+
+
+async def settle(cache: FeedCache):
+    """Wait for the loads the cache is running, background refreshes included"""
+    while cache._loading:
+        await asyncio.gather(*cache._loading.values(), return_exceptions=True)
+
+
+def test_concurrent_misses_share_one_load():
+    async def scenario():
+        cache = FeedCache(10, ttl=60, stale_ttl=60)
+        load = FakeLoad(held=True)
+        waiters = [asyncio.create_task(cache.get(("Tech", 1), "Tech", load)) for _ in range(5)]
+        await asyncio.sleep(0)
+        load.release.set()
+        pages = await asyncio.gather(*waiters)
+
+        assert load.calls == 1
+        assert all(page["body"] == "page" for page in pages)
+        assert cache.stats["misses"] == 1
+        assert cache.stats["coalesced"] == 4
+
+    asyncio.run(scenario())
+
+
+def test_stale_hit_starts_exactly_one_refresh():
+    async def scenario():
+        # ttl=0: every entry is stale as soon as it is stored
+        cache = FeedCache(10, ttl=0, stale_ttl=60)
+        await cache.get(("Tech", 1), "Tech", FakeLoad("old"))
+
+        load = FakeLoad("new", held=True)
+        pages = [await cache.get(("Tech", 1), "Tech", load) for _ in range(3)]
+        assert [page["body"] for page in pages] == ["old", "old", "old"]
+        assert cache.stats["stale_hits"] == 3
+        assert cache.stats["refreshes"] == 1
+        assert len(cache._loading) == 1
+
+        load.release.set()
+        await settle(cache)
+        assert load.calls == 1
+        assert cache._entries[("Tech", 1)]["body"] == "new"
+        assert cache.stats["refresh_errors"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_invalidate_category_expires_it_and_the_unfiltered_feed():
+    async def scenario():
+        cache = FeedCache(10, ttl=60, stale_ttl=60)
+        for category in ["Tech", "Health", ALL_CATEGORIES]:
+            await cache.get((category, 1), category, FakeLoad("old"))
+
+        cache.invalidate("Tech")
+
+        load = FakeLoad("new")
+        for category in ["Tech", ALL_CATEGORIES]:
+            assert (await cache.get((category, 1), category, load))["body"] == "old"
+        assert cache.stats["stale_hits"] == 2
+        assert (await cache.get(("Health", 1), "Health", load))["body"] == "old"
+        assert cache.stats["hits"] == 1
+        await settle(cache)
+        assert load.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_invalidate_everything():
+    async def scenario():
+        cache = FeedCache(10, ttl=60, stale_ttl=60)
+        for category in ["Tech", "Health", ALL_CATEGORIES]:
+            await cache.get((category, 1), category, FakeLoad())
+
+        cache.invalidate()
+
+        assert all(entry["fresh_until"] == 0.0 for entry in cache._entries.values())
+
+    asyncio.run(scenario())
+
+
+def test_load_overlapping_an_invalidation_is_stored_expired():
+    async def scenario():
+        cache = FeedCache(10, ttl=60, stale_ttl=60)
+        tech, health = FakeLoad(held=True), FakeLoad(held=True)
+        waiters = [
+            asyncio.create_task(cache.get(("Tech", 1), "Tech", tech)),
+            asyncio.create_task(cache.get(("Health", 1), "Health", health)),
+        ]
+        while not (tech.calls and health.calls):
+            await asyncio.sleep(0)
+        cache.invalidate("Tech")
+        tech.release.set()
+        health.release.set()
+        tech_page, health_page = await asyncio.gather(*waiters)
+
+        # The Tech page may predate the change, it is served but revalidated
+        assert tech_page["fresh_until"] == 0.0
+        assert health_page["fresh_until"] > 0.0
+
+        load = FakeLoad()
+        await cache.get(("Tech", 1), "Tech", load)
+        await settle(cache)
+        assert cache.stats["refreshes"] == 1
+        assert load.calls == 1
+
+    asyncio.run(scenario())
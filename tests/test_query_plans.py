@@ -0,0 +1,289 @@
+"""
+Query plan regression tests for the API's MongoDB queries.
+
+Seeds a scratch database on a local mongod, calls the endpoint functions
+from server.py directly and records every find, aggregate and
+findAndModify they send with a PyMongo command listener. Each recorded
+command is then re-run with explain("executionStats"). A scenario fails
+when a winning plan contains a COLLSCAN, a $lookup scans a collection, or
+a stage examines more than QUERY_PLANS_MAX_RATIO times the documents it
+returns.
+
+Covered: the idea feed for every sort_by (with and without a category and
+on the second page), the community feed, idea details and comments, the
+dashboard (first load with the stats backfill and steady state), analytics
+and the auth lookups.
+
+Skipped unless a mongod answers at QUERY_PLANS_MONGO_URL (default
+mongodb://localhost:27017). The scratch database is dropped and reseeded
+on every run, so QUERY_PLANS_DB has to end in "_query_plans".
+backend/check_query_plans.py runs this module with command line options.
+"""
+import asyncio
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+import pytest
+
+pymongo = pytest.importorskip("pymongo")
+motor_asyncio = pytest.importorskip("motor.motor_asyncio")
+from pymongo import monitoring  # noqa: E402
+
+MONGO_URL = os.environ.get("QUERY_PLANS_MONGO_URL", "mongodb://localhost:27017")
+DB_NAME = os.environ.get("QUERY_PLANS_DB", "ideahero_query_plans")
+MAX_RATIO = float(os.environ.get("QUERY_PLANS_MAX_RATIO", "10"))  # documents examined per document returned
+IDEAS = int(os.environ.get("QUERY_PLANS_IDEAS", "2000"))
+USERS = int(os.environ.get("QUERY_PLANS_USERS", "200"))
+KEEP = os.environ.get("QUERY_PLANS_KEEP", "false").lower() == "true"  # keep the scratch database afterwards
+
+if not DB_NAME.endswith("_query_plans"):
+    raise pytest.UsageError("QUERY_PLANS_DB must end in _query_plans, the database is dropped on every run")
+
+try:
+    pymongo.MongoClient(MONGO_URL, serverSelectionTimeoutMS=1000).admin.command("ping")
+except pymongo.errors.PyMongoError:
+    pytest.skip(f"no mongod reachable at {MONGO_URL}", allow_module_level=True)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+import server  # noqa: E402
+from fastapi import Response  # noqa: E402
+from fastapi.security import HTTPAuthorizationCredentials  # noqa: E402
+
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "findAndModify", "count", "distinct"}
+# Session and routing fields the driver adds, explain rejects some of them
+DRIVER_FIELDS = {"lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "readConcern"}
+CATEGORIES = ["Technology", "Health", "Education", "Finance", "Sustainability", "Entertainment"]
+
+
+class CommandRecorder(monitoring.CommandListener):
+    """Keeps the explainable commands sent to one database while recording is on"""
+
+    def __init__(self, database: str):
+        self.database = database
+        self.recording = False
+        self.commands: List[Dict[str, Any]] = []
+
+    def started(self, event):
+        if self.recording and event.database_name == self.database and event.command_name in EXPLAINABLE_COMMANDS:
+            self.commands.append({key: value for key, value in event.command.items() if key not in DRIVER_FIELDS})
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def plan_problems(explain: Dict[str, Any], max_ratio: float) -> List[str]:
+    """COLLSCANs and over-examining stages anywhere in an explain result"""
+    problems = []
+
+    def walk(node):
+        if isinstance(node, list):
+            for item in node:
+                walk(item)
+            return
+        if not isinstance(node, dict):
+            return
+        if node.get("stage") == "COLLSCAN":
+            problems.append("COLLSCAN")
+        if node.get("collectionScans", 0) > 0:
+            problems.append(f"$lookup ran {node['collectionScans']} collection scans")
+        examined, returned = node.get("totalDocsExamined"), node.get("nReturned")
+        if examined is not None and returned is not None and examined > max_ratio * max(returned, 1):
+            problems.append(f"examined {examined} documents to return {returned}")
+        for key, value in node.items():
+            if key not in ("rejectedPlans", "allPlansExecution"):
+                walk(value)
+
+    walk(explain)
+    return sorted(set(problems))
+
+
+def describe(command: Dict[str, Any]) -> str:
+    name = next(iter(command))
+    shape = command.get("filter") or command.get("query") or (command.get("pipeline") or [{}])[0]
+    text = f"{name} {command[name]} {shape}"
+    return text if len(text) <= 110 else text[:107] + "..."
+
+
+async def seed(ideas: int, users: int) -> Dict[str, Any]:
+    """Fill the scratch database with enough data for the planner to choose indexes"""
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    password = "query-plans"
+    hashed_password = server.get_password_hash(password)
+
+    user_docs = []
+    for i in range(users):
+        user = server.User(
+            email=f"user{i}@example.com",
+            full_name=f"User {i}",
+            created_at=now - timedelta(days=rng.randint(30, 400)),
+        )
+        user_docs.append({**user.dict(), "hashed_password": hashed_password})
+    await server.db.users.insert_many(user_docs)
+
+    idea_docs = []
+    for i in range(ideas):
+        upvotes, downvotes = rng.randint(0, 50), rng.randint(0, 20)
+        total = upvotes + downvotes
+        idea = server.EnhancedIdea(
+            title=f"Idea {i}",
+            description="A seeded idea for query plan checks",
+            category=rng.choice(CATEGORIES),
+            created_at=now - timedelta(hours=rng.randint(0, 24 * 365)),
+        ).dict()
+        idea.update({
+            "total_votes": total,
+            "upvotes": upvotes,
+            "downvotes": downvotes,
+            "feasibility_total": total * 3,
+            "market_potential_total": total * 3,
+            "interest_total": total * 3,
+            "comment_count": 0,
+        })
+        idea.update(server.scores_from_counters(idea))
+        idea_docs.append(idea)
+    await server.db.ideas.insert_many(idea_docs)
+    await server.refresh_rankings()
+
+    vote_docs, comment_docs, submitted_docs = [], [], []
+    for user in user_docs:
+        for idea in rng.sample(idea_docs, min(30, len(idea_docs))):
+            vote = server.IdeaVote(
+                user_id=user["id"],
+                vote_type=rng.choice(["upvote", "downvote"]),
+                feasibility_score=rng.randint(1, 5),
+                market_potential_score=rng.randint(1, 5),
+                interest_score=rng.randint(1, 5),
+                created_at=now - timedelta(days=rng.randint(0, 120)),
+            ).dict()
+            vote_docs.append(server.encode_vote(vote, idea["id"], "ideas"))
+        for idea in rng.sample(idea_docs, min(10, len(idea_docs))):
+            comment = server.IdeaComment(
+                user_id=user["id"],
+                user_name=user["full_name"],
+                content="A seeded comment for query plan checks",
+                created_at=now - timedelta(days=rng.randint(0, 120)),
+            ).dict()
+            comment_docs.append({**comment, "idea_id": idea["id"], "idea_collection": "ideas"})
+        for status in rng.sample(["pending", "approved", "approved", "rejected", "draft"], 2):
+            submitted_docs.append(server.SubmittedIdea(
+                title=f"Submission of {user['full_name']}",
+                description="A seeded submission for query plan checks",
+                category=rng.choice(CATEGORIES),
+                submitter_id=user["id"],
+                submitter_name=user["full_name"],
+                status=status,
+                created_at=now - timedelta(days=rng.randint(0, 120)),
+            ).dict())
+    await server.db.idea_votes.insert_many(vote_docs)
+    await server.db.idea_comments.insert_many(comment_docs)
+    await server.db.submitted_ideas.insert_many(submitted_docs)
+
+    user = user_docs[0]
+    token = server.issue_access_token(server.User(**user))
+    return {
+        "user": user,
+        "password": password,
+        "idea_id": idea_docs[0]["id"],
+        "credentials": HTTPAuthorizationCredentials(scheme="Bearer", credentials=token),
+        "token_user": server.TokenUser(**user),
+    }
+
+
+async def feed(route, sort_by, category=None, second_page=False):
+    # The feed cache is off, so the request is only needed to satisfy the signature
+    extra = {"request": None} if route is server.get_all_ideas else {}
+    response = Response()
+    await route(response=response, category=category, sort_by=sort_by, limit=20, skip=0, cursor=None, view="summary", **extra)
+    if second_page and "X-Next-Cursor" in response.headers:
+        await route(response=Response(), category=category, sort_by=sort_by, limit=20, skip=0,
+                    cursor=response.headers["X-Next-Cursor"], view="summary", **extra)
+
+
+def scenarios():
+    """(name, coroutine function of the seeded fixtures) for every endpoint covered, in run order"""
+    result = []
+    for sort_by in server.FEED_SORT_FIELDS:
+        result.append((f"GET /ideas?sort_by={sort_by}", lambda f, s=sort_by: feed(server.get_all_ideas, s, second_page=True)))
+        result.append((f"GET /ideas?sort_by={sort_by}&category", lambda f, s=sort_by: feed(server.get_all_ideas, s, CATEGORIES[0])))
+        result.append((f"GET /ideas/community?sort_by={sort_by}", lambda f, s=sort_by: feed(server.get_community_ideas, s, second_page=True)))
+    result.append(("GET /ideas/community?category", lambda f: feed(server.get_community_ideas, "created_at", CATEGORIES[0])))
+    result += [
+        ("GET /ideas/{id}", lambda f: server.get_idea_details(f["idea_id"])),
+        ("GET /ideas/{id}/comments", lambda f: server.get_idea_comments(f["idea_id"], after=None, limit=20)),
+        ("POST /auth/login", lambda f: server.login_user(server.UserLogin(email=f["user"]["email"], password=f["password"]))),
+        ("get_current_user", lambda f: server.get_current_user(f["credentials"])),
+        ("get_token_user", lambda f: server.get_token_user(f["credentials"])),
+        ("GET /user/dashboard (backfill)", lambda f: server.get_user_dashboard(current_user=f["token_user"])),
+        ("GET /user/dashboard", lambda f: server.get_user_dashboard(current_user=f["token_user"])),
+        ("GET /user/analytics", lambda f: server.get_user_analytics(
+            current_user=f["token_user"], from_=None, to=None, granularity="month")),
+        ("GET /user/analytics?granularity=day&from&to", lambda f: server.get_user_analytics(
+            current_user=f["token_user"], from_=(datetime.utcnow() - timedelta(days=30)).strftime("%Y-%m-%d"),
+            to=datetime.utcnow().strftime("%Y-%m"), granularity="day")),
+    ]
+    return result
+
+
+SCENARIOS = scenarios()
+
+
+async def explain_scenarios(recorder: CommandRecorder) -> Dict[str, List[str]]:
+    """Run every scenario in order, returns the plan problems of each"""
+    await server.client.drop_database(DB_NAME)
+    await server.ensure_indexes()
+    fixtures = await seed(IDEAS, USERS)
+
+    results = {}
+    for name, call in SCENARIOS:
+        recorder.commands = []
+        recorder.recording = True
+        try:
+            await call(fixtures)
+        finally:
+            recorder.recording = False
+        # Let the user stats flush writes of the backfill settle before explaining
+        await server.user_stats_recorder.flush()
+
+        problems = []
+        for command in recorder.commands:
+            explain = await server.db.command({"explain": command, "verbosity": "executionStats"})
+            problems += [f"{describe(command)}: {problem}" for problem in plan_problems(explain, MAX_RATIO)]
+        results[name] = problems
+
+    if not KEEP:
+        await server.client.drop_database(DB_NAME)
+    return results
+
+
+@pytest.fixture(scope="module")
+def plan_problems_by_scenario():
+    """Points server at the scratch database and explains every scenario once"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    recorder = CommandRecorder(DB_NAME)
+    with pytest.MonkeyPatch.context() as patch:
+        client = motor_asyncio.AsyncIOMotorClient(MONGO_URL, event_listeners=[recorder])
+        patch.setattr(server, "client", client)
+        patch.setattr(server, "db", client[DB_NAME])
+        patch.setattr(server, "VOTE_BUFFER_ENABLED", False)
+        patch.setattr(server, "FEED_CACHE_ENABLED", False)
+        try:
+            yield loop.run_until_complete(explain_scenarios(recorder))
+        finally:
+            client.close()
+            asyncio.set_event_loop(None)
+            loop.close()
+
+
+@pytest.mark.parametrize("name", [name for name, _ in SCENARIOS])
+def test_query_plans_use_indexes(name, plan_problems_by_scenario):
+    problems = plan_problems_by_scenario[name]
+    assert not problems, "regressed query plans:\n" + "\n".join(problems)
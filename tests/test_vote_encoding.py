@@ -0,0 +1,78 @@
+import itertools
+import os
+import sys
+import uuid
+from datetime import datetime
+
+import pytest
+from pydantic import ValidationError
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from server import (  # noqa: E402
+    VOTE_SCORE_FIELDS,
+    VoteCreate,
+    decode_vote,
+    encode_vote,
+    pack_vote,
+    unpack_vote,
+)
+
+SCORES = range(1, 6)
+
+
+def make_vote(vote_type="upvote", scores=(3, 4, 5)):
+    return {"vote_type": vote_type, **dict(zip(VOTE_SCORE_FIELDS, scores))}
+
+
+@pytest.mark.parametrize("vote_type", ["upvote", "downvote"])
+def test_pack_unpack_round_trip(vote_type):
+    for scores in itertools.product(SCORES, repeat=len(VOTE_SCORE_FIELDS)):
+        vote = make_vote(vote_type, scores)
+        assert unpack_vote(pack_vote(vote)) == vote
+
+
+def test_encode_decode_round_trip():
+    vote = {
+        "user_id": str(uuid.uuid4()),
+        "created_at": datetime(2024, 5, 17, 12, 30, 15),
+        **make_vote("downvote", (1, 5, 2)),
+    }
+    doc = encode_vote(vote, "idea-1", "ideas")
+    assert decode_vote(doc) == {**vote, "idea_id": "idea-1", "idea_collection": "ideas"}
+
+
+def test_encode_keeps_non_uuid_user_ids():
+    vote = {"user_id": "legacy-user", "created_at": datetime(2024, 1, 1), **make_vote()}
+    assert decode_vote(encode_vote(vote, "idea-1", "ideas"))["user_id"] == "legacy-user"
+
+
+@pytest.mark.parametrize("vote", [
+    make_vote("sideways"),
+    make_vote(scores=(0, 3, 3)),
+    make_vote(scores=(3, 6, 3)),
+    make_vote(scores=(3, 3, 8)),
+    make_vote(scores=(3, -1, 3)),
+    make_vote(scores=(3.5, 3, 3)),
+    make_vote(scores=(True, 3, 3)),
+])
+def test_pack_vote_rejects_bad_input(vote):
+    with pytest.raises(ValueError):
+        pack_vote(vote)
+
+
+@pytest.mark.parametrize("field,value", [
+    ("vote_type", "sideways"),
+    ("feasibility_score", 0),
+    ("market_potential_score", 6),
+    ("interest_score", 7),
+])
+def test_vote_create_rejects_bad_input(field, value):
+    data = {"idea_id": "idea-1", **make_vote(), field: value}
+    with pytest.raises(ValidationError):
+        VoteCreate(**data)
+
+
+def test_vote_create_accepts_valid_input():
+    vote = VoteCreate(idea_id="idea-1", **make_vote("downvote", (1, 3, 5)))
+    assert pack_vote(vote.dict()) == pack_vote(make_vote("downvote", (1, 3, 5)))